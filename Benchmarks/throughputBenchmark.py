@@ -0,0 +1,335 @@
+#!/usr/bin/python3
+
+"""Throughput benchmarks of fuzzers, runners and the web fuzzer.
+
+   Every benchmark uses a fixed seed and a local target (`cat`, `bc`,
+   the order server of `WebFuzzer/webserver.py`) and reports inputs/sec,
+   execs/sec, p50/p99 latency and peak RSS. Results are compared against
+   a saved baseline; regressions beyond a tolerance are flagged.
+
+       python3 throughputBenchmark.py              # compare with baseline
+       python3 throughputBenchmark.py --save       # store a new baseline
+       python3 throughputBenchmark.py cat bc       # run some benchmarks only
+"""
+
+from typing import Callable, Optional
+from contextlib import redirect_stdout
+import argparse
+import importlib.util
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "Fuzzing_BreakingThingsWithRandomInputs"))
+from runnerClass import ProgramRunner, RandomFuzzer
+
+SEED = 4711
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+
+# Metrics where more is better, and where less is better.
+# `target_rss_kib` is for information only: see `children_rss()`.
+HIGHER_IS_BETTER = ["inputs_per_sec", "execs_per_sec"]
+LOWER_IS_BETTER = ["p50_ms", "p99_ms", "peak_rss_kib"]
+
+
+class SkipBenchmark(Exception):
+    """The benchmark cannot run here, e.g. for lack of its target"""
+    pass
+
+
+class Measurement:
+    """Throughput, latency and memory of one benchmark."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.inputs = 0
+        self.execs = 0
+        self.seconds = 0.0
+        self.latencies: list[float] = []
+        self.peak_rss = 0
+        self.target_rss = 0
+
+    def percentile(self, p: float) -> float:
+        """Return the `p`-th percentile of the step latencies, in seconds"""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "inputs_per_sec": self.inputs / self.seconds,
+            "execs_per_sec": self.execs / self.seconds,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "peak_rss_kib": self.peak_rss,
+            "target_rss_kib": self.target_rss,
+        }
+
+
+def peak_rss(pid: str = "self") -> int:
+    """Return the peak resident set size of process `pid`, in KiB"""
+    with open("/proc/%s/status" % pid) as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def reset_peak_rss() -> None:
+    """Start measuring the peak RSS of this process anew (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def children_rss() -> int:
+    """Return the peak RSS of the largest child terminated so far, in KiB.
+       This is a maximum over the lifetime of this process, so it depends
+       on the benchmarks run before. Children started by `subprocess` also
+       count the memory they share with this process before `exec()`,
+       so small targets show as large."""
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def measure(name: str, step: Callable[[int], object], steps: int,
+            inputs_per_step: int = 1, execs_per_step: int = 0) -> Measurement:
+    """Call `step(i)` for i in range(`steps`), timing every call.
+       Each step produces `inputs_per_step` inputs and
+       runs the target `execs_per_step` times."""
+    measurement = Measurement(name)
+    reset_peak_rss()
+    start = time.perf_counter()
+    for i in range(steps):
+        step_start = time.perf_counter()
+        step(i)
+        measurement.latencies.append(time.perf_counter() - step_start)
+    measurement.seconds = time.perf_counter() - start
+    measurement.inputs = steps * inputs_per_step
+    measurement.execs = steps * execs_per_step
+    measurement.peak_rss = peak_rss()
+    if execs_per_step > 0:
+        measurement.target_rss = children_rss()
+    return measurement
+
+
+# Modules imported by `load_module()`, by name
+_modules: dict = {}
+
+
+def load_module(name: str, path: str):
+    """Import the script at `path` as module `name`, silencing its demos.
+       Raise `SkipBenchmark` if one of its dependencies is missing."""
+    if name in _modules:
+        return _modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        with redirect_stdout(io.StringIO()):
+            spec.loader.exec_module(module)
+    except ImportError as exc:
+        raise SkipBenchmark("cannot import %s: %s" % (path, exc))
+    _modules[name] = module
+    return module
+
+
+def random_fuzzer(scale: float) -> Measurement:
+    """`RandomFuzzer.fuzz()`, one input at a time"""
+    fuzzer = RandomFuzzer()
+    fuzzer.rng = random.Random(SEED)
+    return measure("random_fuzzer", lambda i: fuzzer.fuzz(), int(20000 * scale))
+
+
+def random_fuzzer_batch(scale: float) -> Measurement:
+    """`RandomFuzzer.fuzz_batch()`, 100 inputs per step"""
+    fuzzer = RandomFuzzer()
+    fuzzer.rng = random.Random(SEED)
+    return measure("random_fuzzer_batch", lambda i: fuzzer.fuzz_batch(100),
+                   int(200 * scale), inputs_per_step=100)
+
+
+def grammar_fuzzer(scale: float) -> Measurement:
+    """`simple_grammar_fuzzer()` on the expression grammar"""
+    grammar = load_module("fuzzingGrammar",
+                          os.path.join(ROOT, "fuzzingGrammar", "pythonGrammar.py"))
+
+    def step(i: int) -> None:
+        try:
+            grammar.simple_grammar_fuzzer(grammar.EXPR_GRAMMAR,
+                                          max_nonterminals=5)
+        except grammar.ExpansionError:
+            pass
+
+    random.seed(SEED)
+    return measure("grammar_fuzzer", step, int(2000 * scale))
+
+
+def grammar_generator(scale: float) -> Measurement:
+    """Code generated for the URL grammar by `grammar_generator()`"""
+    grammar = load_module("fuzzingGrammar",
+                          os.path.join(ROOT, "fuzzingGrammar", "pythonGrammar.py"))
+    generate = grammar.grammar_generator(grammar.URL_GRAMMAR)
+    random.seed(SEED)
+    return measure("grammar_generator", lambda i: generate(), int(20000 * scale))
+
+
+def program_runner(name: str, program: str, steps: int) -> Measurement:
+    """`ProgramRunner.run()` with pre-generated random inputs"""
+    if shutil.which(program) is None:
+        raise SkipBenchmark("%s not found" % program)
+    fuzzer = RandomFuzzer()
+    fuzzer.rng = random.Random(SEED)
+    inputs = fuzzer.fuzz_batch(steps)
+    runner = ProgramRunner(program, timeout=1.0)
+    return measure(name, lambda i: runner.run(inputs[i]), steps,
+                   inputs_per_step=0, execs_per_step=1)
+
+
+def cat_runner(scale: float) -> Measurement:
+    return program_runner("cat", "cat", int(1000 * scale))
+
+
+def bc_runner(scale: float) -> Measurement:
+    return program_runner("bc", "bc", int(500 * scale))
+
+
+def fuzz_cat(scale: float) -> Measurement:
+    """`RandomFuzzer.run()` on `cat`: generating and running"""
+    fuzzer = RandomFuzzer()
+    fuzzer.rng = random.Random(SEED)
+    runner = ProgramRunner("cat", timeout=1.0)
+    return measure("fuzz_cat", lambda i: fuzzer.run(runner), int(1000 * scale),
+                   inputs_per_step=1, execs_per_step=1)
+
+
+def web_runner(scale: float) -> Measurement:
+    """`WebRunner.run()` against the order server, with order URLs"""
+    web_dir = os.path.join(ROOT, "WebFuzzer")
+    sys.path.append(web_dir)
+    cwd = os.getcwd()
+    # Both modules create `orders.db` in the current directory
+    os.chdir(tempfile.mkdtemp(prefix="webbench"))
+    try:
+        webserver = load_module("webserver", os.path.join(web_dir, "webserver.py"))
+        web = load_module("webFuzzer", os.path.join(web_dir, "pythonGrammar.py"))
+        httpd_process, httpd_url = webserver.start_httpd()
+        try:
+            random.seed(SEED)
+            order_fuzzer = web.GrammarFuzzer(web.ORDER_GRAMMAR)
+            steps = int(500 * scale)
+            paths = [order_fuzzer.fuzz() for i in range(steps)]
+            runner = web.WebRunner(httpd_url)
+            measurement = measure("web_runner", lambda i: runner.run(paths[i]),
+                                  steps, inputs_per_step=0, execs_per_step=1)
+            measurement.target_rss = peak_rss(str(httpd_process.pid))
+            return measurement
+        finally:
+            httpd_process.terminate()
+            httpd_process.join()
+            webserver.clear_httpd_messages()
+    finally:
+        os.chdir(cwd)
+
+
+BENCHMARKS: dict[str, Callable[[float], Measurement]] = {
+    "random_fuzzer": random_fuzzer,
+    "random_fuzzer_batch": random_fuzzer_batch,
+    "grammar_fuzzer": grammar_fuzzer,
+    "grammar_generator": grammar_generator,
+    "cat": cat_runner,
+    "bc": bc_runner,
+    "fuzz_cat": fuzz_cat,
+    "web_runner": web_runner,
+}
+
+
+def regressions(results: dict[str, dict[str, float]],
+                baseline: dict[str, dict[str, float]],
+                tolerance: float) -> list[str]:
+    """Return descriptions of all metrics in `results` that are worse
+       than in `baseline` by more than `tolerance` (a fraction)"""
+    found = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for key in HIGHER_IS_BETTER:
+            if old.get(key) and metrics[key] < old[key] * (1 - tolerance):
+                found.append("%s: %s %.4g < %.4g" % (name, key, metrics[key], old[key]))
+        for key in LOWER_IS_BETTER:
+            if old.get(key) and metrics[key] > old[key] * (1 + tolerance):
+                found.append("%s: %s %.4g > %.4g" % (name, key, metrics[key], old[key]))
+    return found
+
+
+def print_results(results: dict[str, dict[str, float]]) -> None:
+    print("%-20s %12s %12s %10s %10s %12s %12s" %
+          ("benchmark", "inputs/s", "execs/s", "p50 ms", "p99 ms",
+           "RSS KiB", "target KiB"))
+    for name, m in results.items():
+        print("%-20s %12.1f %12.1f %10.3f %10.3f %12d %12d" %
+              (name, m["inputs_per_sec"], m["execs_per_sec"], m["p50_ms"],
+               m["p99_ms"], m["peak_rss_kib"], m["target_rss_kib"]))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fuzzing throughput benchmarks")
+    parser.add_argument("benchmarks", nargs="*",
+                        help="benchmarks to run (default: all): " +
+                             ", ".join(BENCHMARKS))
+    parser.add_argument("--baseline", default=BASELINE,
+                        help="baseline file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true",
+                        help="save the results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="flag metrics worse than the baseline by "
+                             "more than this fraction (default: %(default)s)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply the number of steps by this")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark %r" % name)
+
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        try:
+            results[name] = BENCHMARKS[name](args.scale).summary()
+        except SkipBenchmark as exc:
+            print("%s: skipped (%s)" % (name, exc), file=sys.stderr)
+    print_results(results)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.save:
+        print("No baseline at %s; nothing to compare against. "
+              "Run with --save to create one." % args.baseline,
+              file=sys.stderr)
+
+    if args.save:
+        # Keep the baseline of benchmarks not run this time
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        return 0
+
+    found = regressions(results, baseline, args.tolerance)
+    for regression in found:
+        print("REGRESSION " + regression)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,70 @@
 #!/usr/bin/python3
 
-import subprocess
 import sys
 import os
 from FTB.ProgramConfiguration import ProgramConfiguration
 from FTB.Signatures.CrashInfo import CrashInfo
 from Collector.Collector import Collector
+from crashTriage import find_crash
 import random
 import tempfile
 
-random.seed(0)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "Fuzzing_BreakingThingsWithRandomInputs"))
+from dictionary import ArgumentFuzzer, extract_dictionary
+from campaignStats import CampaignStats, StatsServer
+from runnerClass import BinaryProgramRunner, Runner
+
+# Every input is determined by (campaign seed, shard, trial);
+# set FUZZ_SHARD to run further shards of the campaign in parallel
+CAMPAIGN_SEED = 0
+SHARD = int(os.environ.get("FUZZ_SHARD", "0"))
 cmd = ["simply-buggy/maze"]
 
-constants = [3735928559, 1111638594]
+# Magic values the maze compares its arguments against,
+# mined from its comparisons instead of by hand
+constants = extract_dictionary(cmd[0]).integers
+argument_fuzzer = ArgumentFuzzer(constants, arguments=4,
+                                 constant_probability=0.3)
 
 TRIALS = 1000
+TIMEOUT = 5  # seconds per run; hanging inputs are skipped
+
+# On timeout, the process group of the maze is killed
+maze = BinaryProgramRunner(cmd, discard_stdout=True, timeout=TIMEOUT)
+
+# Progress goes to maze-status.json and to a local web page
+stats = CampaignStats("maze-status.json")
+stats_server = StatsServer(stats)
+print("Campaign stats at", stats_server.url)
+secrets = set()
 
 for itnum in range(0, TRIALS):
     current_cmd = []
     current_cmd.extend(cmd)
+    current_cmd.extend(argument_fuzzer.fuzz_trial(CAMPAIGN_SEED, SHARD, itnum))
 
-    for _ in range(0, 4):
-        if random.randint(0, 9) < 3:
-            current_cmd.append(str(constants[
-                random.randint(0, len(constants) - 1)]))
-        else:
-            current_cmd.append(str(random.randint(-2147483647, 2147483647)))
-
-    result = subprocess.run(current_cmd, stderr=subprocess.PIPE)
-    stderr = result.stderr.decode().splitlines()
-    crashed = False
-
-    if stderr and "secret" in stderr[0]:
-        print(stderr[0])
-
-    for line in stderr:
-        if "ERROR: AddressSanitizer" in line:
-            crashed = True
-            break
+    stats.execution()
+    maze.program = current_cmd
+    result, outcome = maze.run(b"")
+    if outcome == Runner.TIMEOUT:
+        print("Timeout:", current_cmd)
+        continue
+    first_line = result.stderr.split(b"\n", 1)[0]
+    if b"secret" in first_line:
+        print(first_line.decode())
+        if first_line not in secrets:
+            secrets.add(first_line)
+            stats.finding()
 
-    if crashed:
+    report = find_crash(result.stderr)
+    if report is not None:
+        stats.crash(report.bucket)
         print("Found the bug!")
         break
 
+stats.write()
+stats_server.close()
 print("Done!")
 
 
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+
+from typing import Any, Optional
+from FTB.Signatures.CrashInfo import CrashInfo
+import itertools
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+Crash = tuple[list[str], list[str], bytes, dict]
+
+
+class CrashSubmitter:
+    """Submit crashes to a collector from a background thread.
+
+       `submit()` only queues the crash; a worker parses it into a `CrashInfo`
+       and hands it to the collector. When the queue is full or the collector
+       fails, crashes are spooled to disk and submitted later."""
+
+    def __init__(self, collector: Any, configuration: Any,
+                 batch_size: int = 16, max_pending: int = 1000,
+                 spool_dir: Optional[str] = None,
+                 retry_delay: float = 5.0) -> None:
+        """Start the worker.
+           `collector` is a FuzzManager `Collector` (or anything with
+             a `submit(crashInfo, testCase=...)` method)
+           `configuration` is the `ProgramConfiguration` of the target,
+             read once by the caller
+           `batch_size` is the maximum number of crashes taken per batch
+           `max_pending` is the number of crashes queued in memory
+           `spool_dir` holds crashes that did not fit in the queue
+           `retry_delay` is the time to wait after a failed submission"""
+        self.collector = collector
+        self.configuration = configuration
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="crashspool")
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self.pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.spool_names = itertools.count()
+        self.submitted = 0
+        self.failed = 0
+        self.closing = threading.Event()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def submit(self, stdout: list[str], stderr: list[str],
+               test_case: bytes, metadata: Optional[dict] = None) -> None:
+        """Queue a crash with its output lines and test case;
+           `metadata` is passed on to the collector.
+           Never waits for the collector."""
+        crash = (stdout, stderr, test_case, metadata or {})
+        try:
+            self.pending.put_nowait(crash)
+        except queue.Full:
+            self.spool(crash)
+
+    def spool(self, crash: Crash) -> None:
+        """Save `crash` to the spool directory"""
+        stdout, stderr, test_case, metadata = crash
+        name = "%d-%d.json" % (os.getpid(), next(self.spool_names))
+        path = os.path.join(self.spool_dir, name)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"stdout": stdout, "stderr": stderr,
+                       "testCase": test_case.hex(), "metaData": metadata}, f)
+        os.replace(path + ".tmp", path)
+
+    def unspool(self, limit: int) -> list[Crash]:
+        """Take up to `limit` crashes from the spool directory"""
+        crashes = []
+        for name in sorted(os.listdir(self.spool_dir))[:limit]:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            with open(path) as f:
+                data = json.load(f)
+            os.remove(path)
+            crashes.append((data["stdout"], data["stderr"],
+                            bytes.fromhex(data["testCase"]), data["metaData"]))
+        return crashes
+
+    def next_batch(self) -> list[Crash]:
+        """Wait for the next batch of crashes, queued ones first"""
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                if batch:
+                    batch.append(self.pending.get_nowait())
+                else:
+                    batch.append(self.pending.get(timeout=0.5))
+            except queue.Empty:
+                break
+        if len(batch) < self.batch_size:
+            batch += self.unspool(self.batch_size - len(batch))
+        return batch
+
+    def work(self) -> None:
+        """Worker loop: submit batches until closed and drained"""
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                if self.closing.is_set():
+                    return
+                continue
+            for i, crash in enumerate(batch):
+                try:
+                    self.send(crash)
+                    self.submitted += 1
+                except Exception:
+                    # Collector unavailable: keep the rest for later
+                    self.failed += 1
+                    for crash in batch[i:]:
+                        self.spool(crash)
+                    if self.closing.is_set():
+                        self.spool_pending()
+                        return
+                    time.sleep(self.retry_delay)
+                    break
+
+    def spool_pending(self) -> None:
+        """Move all queued crashes to the spool directory"""
+        while True:
+            try:
+                self.spool(self.pending.get_nowait())
+            except queue.Empty:
+                return
+
+    def send(self, crash: Crash) -> None:
+        """Parse and submit one crash"""
+        stdout, stderr, test_case, metadata = crash
+        crashInfo = CrashInfo.fromRawCrashData(stdout, stderr,
+                                               self.configuration)
+        (fd, path) = tempfile.mkstemp(prefix="fuzztest")
+        try:
+            os.write(fd, test_case)
+            os.close(fd)
+            self.collector.submit(crashInfo, testCase=path, metaData=metadata)
+        finally:
+            os.remove(path)
+
+    def close(self) -> None:
+        """Submit all queued crashes and stop the worker.
+           Crashes that could not be submitted stay in the spool directory."""
+        self.closing.set()
+        self.worker.join()
+
+
+class LocalCollector:
+    """Stand-in for a FuzzManager collector, saving submissions locally."""
+
+    def __init__(self, directory: Optional[str] = None,
+                 delay: float = 0.0) -> None:
+        """Save submissions in `directory`, taking `delay` seconds each"""
+        self.directory = directory or tempfile.mkdtemp(prefix="crashes")
+        self.delay = delay
+        self.submissions = 0
+
+    def submit(self, crashInfo: CrashInfo, testCase: Optional[str] = None,
+               metaData: Optional[dict] = None) -> None:
+        time.sleep(self.delay)
+        self.submissions += 1
+        base = os.path.join(self.directory, "crash-%d" % self.submissions)
+        with open(base + ".txt", "w") as f:
+            f.write("\n".join(crashInfo.rawStderr))
+        if metaData:
+            with open(base + ".json", "w") as f:
+                json.dump(metaData, f)
+        if testCase is not None:
+            with open(testCase, "rb") as src, open(base + ".bin", "wb") as dst:
+                dst.write(src.read())
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+from typing import Optional
+import hashlib
+import json
+import re
+
+# AddressSanitizer reports start with a line like
+#   ==1234==ERROR: AddressSanitizer: heap-buffer-overflow on address ...
+# Leak reports ("ERROR: LeakSanitizer: detected memory leaks"), which
+# AddressSanitizer enables by default, do not count as crashes
+RE_SANITIZER_ERROR = re.compile(rb"ERROR: (AddressSanitizer): ([\w-]+)")
+
+# ... followed by the stack trace, e.g.
+#   #0 0x4f9a8e in main /src/out-of-bounds.c:12:5
+#   #1 0x7f3c2b1e0b96 (/lib/x86_64-linux-gnu/libc.so.6+0x21b96)
+RE_FRAME = re.compile(rb"#\d+ 0x[0-9a-fA-F]+ (?:in (\S+)|\(([^+)]+))")
+
+
+class CrashReport:
+    """A sanitizer crash, reduced to what identifies it."""
+
+    def __init__(self, sanitizer: str, crash_type: str,
+                 frames: list[str]) -> None:
+        """`sanitizer` is the reporting sanitizer (e.g. `AddressSanitizer`),
+           `crash_type` the kind of error (e.g. `heap-buffer-overflow`),
+           `frames` the topmost stack frames"""
+        self.sanitizer = sanitizer
+        self.crash_type = crash_type
+        self.frames = frames
+        self.bucket = hashlib.sha1(
+            "\0".join([sanitizer, crash_type] + frames).encode()).hexdigest()
+
+    def __repr__(self) -> str:
+        return "CrashReport(%r, %r, %r)" % (self.sanitizer, self.crash_type,
+                                            self.frames)
+
+    def to_json(self) -> dict:
+        """Return the report as a JSON-serializable dict"""
+        return {"sanitizer": self.sanitizer, "crash_type": self.crash_type,
+                "frames": self.frames}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "CrashReport":
+        """Inverse of `to_json()`"""
+        return cls(data["sanitizer"], data["crash_type"], data["frames"])
+
+
+def find_crash(stderr: bytes, max_frames: int = 3) -> Optional[CrashReport]:
+    """Search raw `stderr` for a sanitizer report.
+       Return a `CrashReport` with the top `max_frames` frames,
+       or None if there was no crash."""
+    match = RE_SANITIZER_ERROR.search(stderr)
+    if match is None:
+        return None
+
+    frames = []
+    for frame in RE_FRAME.finditer(stderr, match.end()):
+        function, module = frame.groups()
+        frames.append((function or module).decode(errors="replace"))
+        if len(frames) >= max_frames:
+            break
+
+    return CrashReport(match.group(1).decode(), match.group(2).decode(), frames)
+
+
+class CrashBuckets:
+    """Count crashes by bucket, keeping the first report of each."""
+
+    def __init__(self) -> None:
+        self.counts: dict[str, int] = {}
+        self.first: dict[str, CrashReport] = {}
+
+    def add(self, report: CrashReport) -> bool:
+        """Account for `report`. Return True if its bucket is new."""
+        count = self.counts.get(report.bucket, 0)
+        self.counts[report.bucket] = count + 1
+        if count == 0:
+            self.first[report.bucket] = report
+        return count == 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def to_json(self) -> dict:
+        """Return counts and first reports as a JSON-serializable dict,
+           e.g. for `Checkpoint.extra`"""
+        return {bucket: {"count": count, "first": self.first[bucket].to_json()}
+                for bucket, count in self.counts.items()}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "CrashBuckets":
+        """Inverse of `to_json()`"""
+        buckets = cls()
+        for bucket, entry in data.items():
+            buckets.counts[bucket] = entry["count"]
+            buckets.first[bucket] = CrashReport.from_json(entry["first"])
+        return buckets
+
+
+def escapelines(data: bytes) -> list[str]:
+    """Split `data` into lines, escaping non-ASCII bytes as `\\xNN`"""
+    return [line.decode("ascii", errors="backslashreplace")
+            for line in data.splitlines()]
+
+
+assert find_crash(b"all good\n") is None
+assert find_crash(b"==1==ERROR: LeakSanitizer: detected memory leaks\n") is None
+assert find_crash(
+    b"==1==ERROR: AddressSanitizer: heap-buffer-overflow on address 0x1\n"
+    b"READ of size 1 at 0x1 thread T0\n"
+    b"    #0 0x4f9a8e in main /src/out-of-bounds.c:12:5\n"
+    b"    #1 0x7f3c2b1e0b96 (/lib/libc.so.6+0x21b96)\n").frames == \
+    ["main", "/lib/libc.so.6"]
+_buckets = CrashBuckets()
+_buckets.add(CrashReport("AddressSanitizer", "SEGV", ["main"]))
+assert CrashBuckets.from_json(json.loads(json.dumps(_buckets.to_json()))).counts \
+    == _buckets.counts
+assert escapelines(b"a\xffb\nc") == ["a\\xffb", "c"]
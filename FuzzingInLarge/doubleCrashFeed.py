@@ -1,83 +1,98 @@
 #!/usr/bin/python3
 
-import subprocess
 import sys
 import os
 from FTB.ProgramConfiguration import ProgramConfiguration
-from FTB.Signatures.CrashInfo import CrashInfo
 from Collector.Collector import Collector
-import random
-import tempfile
+from crashTriage import CrashBuckets, escapelines, find_crash
+from crashSubmitter import CrashSubmitter
+from signatureCache import SignatureCache
 
-cmd = ["simply-buggy/out-of-bounds"]
-
-def isascii(s):
-    return all([0 <= ord(c) <= 127 for c in s])
-
-def escapelines(bytes):
-    def ascii_chr(byte):
-        if 0 <= byte <= 127:
-            return chr(byte)
-        return r"\x%02x" % byte
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "Fuzzing_BreakingThingsWithRandomInputs"))
+from runnerClass import BinaryFileProgramRunner, Fuzzer, Runner
+from checkpoint import Checkpoint, resumable_runs
 
-    def unicode_escape(line):
-        ret = "".join(map(ascii_chr, line))
-        assert isascii(ret)
-        return ret
-
-    return [unicode_escape(line) for line in bytes.splitlines()]
+cmd = ["simply-buggy/out-of-bounds"]
 
 # Connect to crash server
 collector = Collector()
 
-random.seed(2048)
+# This reads the simple-crash.fuzzmanagerconf file, once
+configuration = ProgramConfiguration.fromBinary(cmd[0])
 
-crash_count = 0
-TRIALS = 20
+# Crashes are parsed into a generic "CrashInfo" object and submitted
+# from a background thread, so fuzzing does not wait for the server
+submitter = CrashSubmitter(collector, configuration)
 
-for itnum in range(0, TRIALS):
-    rand_len = random.randint(1, 1024)
-    rand_data = bytes([random.randrange(0, 256) for i in range(rand_len)])
+# Crashes of already known signatures are only counted; the first one
+# and sampled repeats (with their count) are submitted
+signatures = SignatureCache("crash-signatures.db")
 
-    (fd, current_file) = tempfile.mkstemp(prefix="fuzztest", text=True)
-    os.write(fd, rand_data)
-    os.close(fd)
+# Every input is determined by (campaign seed, shard, trial), so only
+# these are kept; set FUZZ_SHARD to run further shards in parallel
+CAMPAIGN_SEED = 2048
+SHARD = int(os.environ.get("FUZZ_SHARD", "0"))
 
-    current_cmd = []
-    current_cmd.extend(cmd)
-    current_cmd.append(current_file)
+TRIALS = 20
+TIMEOUT = 5  # seconds per run; hanging inputs are skipped
 
-    result = subprocess.run(current_cmd,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE)
-    stdout = []   # escapelines(result.stdout)
-    stderr = escapelines(result.stderr)
-    crashed = False
 
-    for line in stderr:
-        if "ERROR: AddressSanitizer" in line:
-            crashed = True
-            break
+class ByteFuzzer(Fuzzer):
+    """Random byte strings of 1 to 1024 bytes"""
 
-    print(itnum, end=" ")
+    def fuzz(self) -> bytes:
+        return self.rng.randbytes(self.rng.randint(1, 1024))
 
-    if crashed:
-        sys.stdout.write("(Crash) ")
 
-        # This reads the simple-crash.fuzzmanagerconf file
-        configuration = ProgramConfiguration.fromBinary(cmd[0])
+byte_fuzzer = ByteFuzzer()
 
-        # This reads and parses our ASan trace into a more generic format,
-        # returning us a generic "CrashInfo" object that we can inspect
-        # and/or submit to the server.
-        crashInfo = CrashInfo.fromRawCrashData(stdout, stderr, configuration)
+# One in-memory input file, rewritten in place for every trial; on timeout,
+# the process group of the target is killed
+runner = BinaryFileProgramRunner(cmd, timeout=TIMEOUT)
 
-        # Submit the crash
-        collector.submit(crashInfo, testCase = current_file)
+# An interrupted campaign resumes from its last checkpoint, with its
+# crash buckets and counters
+checkpoint = Checkpoint("crash-feed-checkpoint-%d" % SHARD)
+checkpoint.load()
+buckets = CrashBuckets.from_json(checkpoint.extra.get("buckets", {}))
+crash_count = checkpoint.extra.get("submitted", 0)
+hang_count = checkpoint.extra.get("hangs", 0)
 
-        crash_count += 1
+for itnum, result, outcome in resumable_runs(byte_fuzzer, runner, checkpoint,
+                                             CAMPAIGN_SEED, SHARD, TRIALS):
+    if outcome == Runner.TIMEOUT:
+        sys.stdout.write("%d (Timeout) " % itnum)
+        hang_count += 1
+        checkpoint.extra["hangs"] = hang_count
+        continue
+    report = find_crash(result.stderr)
 
-    os.remove(current_file)
+    print(itnum, end=" ")
+
+    if report is not None:
+        sys.stdout.write("(Crash) ")
+        buckets.add(report)
+        checkpoint.extra["buckets"] = buckets.to_json()
+        count = signatures.add(report.bucket)
+
+        if signatures.forward(count):
+            stdout = []   # escapelines(result.stdout)
+            stderr = escapelines(result.stderr)
+            # Only crashing inputs are regenerated
+            rand_data = byte_fuzzer.fuzz_trial(CAMPAIGN_SEED, SHARD, itnum)
+            submitter.submit(stdout, stderr, rand_data,
+                             {"count": count, "seed": CAMPAIGN_SEED,
+                              "shard": SHARD, "trial": itnum})
+            crash_count += 1
+            checkpoint.extra["submitted"] = crash_count
+
+runner.input_file.close()
+submitter.close()
+signatures.close()
 
 print("")
-print("Done, submitted %d crashes after %d runs." % (crash_count, TRIALS))
+print("Done, submitted %d crashes after %d runs (%d timeouts)." %
+      (crash_count, TRIALS, hang_count))
+for bucket, count in buckets.counts.items():
+    print("%6d %r" % (count, buckets.first[bucket]))
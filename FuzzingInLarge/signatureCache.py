@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+
+import sqlite3
+
+
+class SignatureCache:
+    """Persistent crash counts per signature bucket.
+
+       Decides which crashes are worth forwarding to the collector:
+       the first crash of a bucket, then one in every `sample_every`,
+       so that the server learns how often a known crash happens
+       without receiving all of them.
+
+       Several processes (e.g. one per `FUZZ_SHARD`) may share the
+       database: counts are written back as increments, and the first
+       crash of a bucket is claimed in the database right away, so that
+       only one process forwards it."""
+
+    def __init__(self, path: str = "signatures.db",
+                 sample_every: int = 1000, flush_every: int = 100) -> None:
+        """Open (or create) the cache in the SQLite database at `path`.
+           `sample_every`: forward every n-th repeat of a known bucket
+           `flush_every`: write counts back after this many updates"""
+        self.sample_every = sample_every
+        self.flush_every = flush_every
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS signatures "
+                        "(bucket TEXT PRIMARY KEY, count INTEGER)")
+        self.db.commit()
+        self.counts: dict[str, int] = dict(
+            self.db.execute("SELECT bucket, count FROM signatures"))
+        # Increments not written back yet
+        self.pending: dict[str, int] = {}
+        self.updates = 0
+
+    def add(self, bucket: str) -> int:
+        """Count one crash in `bucket`. Return the number of crashes seen."""
+        if bucket not in self.counts:
+            # Possibly new: ask the database, which other processes update
+            self.counts[bucket] = self.increment({bucket: 1})[bucket]
+            return self.counts[bucket]
+
+        count = self.counts[bucket] + 1
+        self.counts[bucket] = count
+        self.pending[bucket] = self.pending.get(bucket, 0) + 1
+        self.updates += 1
+        if self.updates >= self.flush_every:
+            self.flush()
+        return count
+
+    def forward(self, count: int) -> bool:
+        """Return True if the `count`-th crash of a bucket is to be submitted"""
+        return count == 1 or count % self.sample_every == 0
+
+    def increment(self, deltas: dict[str, int]) -> dict[str, int]:
+        """Add `deltas` to the counts on disk, in one transaction.
+           Return the new counts of these buckets."""
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO signatures VALUES (?, ?) "
+                "ON CONFLICT(bucket) DO UPDATE SET count = count + excluded.count",
+                deltas.items())
+            return {bucket: self.db.execute(
+                        "SELECT count FROM signatures WHERE bucket = ?",
+                        (bucket,)).fetchone()[0]
+                    for bucket in deltas}
+
+    def flush(self) -> None:
+        """Write pending counts to disk, and take over those of others"""
+        if self.pending:
+            self.counts.update(self.increment(self.pending))
+        self.pending.clear()
+        self.updates = 0
+
+    def close(self) -> None:
+        """Flush and close the cache"""
+        self.flush()
+        self.db.close()
+
+    def __len__(self) -> int:
+        return len(self.counts)
@@ -5,15 +5,14 @@ import random
 import os
 import tempfile
 import subprocess
+from runnerClass import FileProgramRunner, OutcomeAggregator, Runner
 
 def fuzzer(max_length: int = 100, char_start: int = 32, char_range: int = 32) -> str:
     """A string of up to `max_length` characters
        in the range [`char_start`, `char_start` + `char_range`)"""
     string_length = random.randrange(0, max_length + 1)
-    out = ""
-    for i in range(0, string_length):
-        out += chr(random.randrange(char_start, char_start + char_range))
-    return out
+    return "".join(map(chr, random.choices(range(char_start, char_start + char_range),
+                                           k=string_length)))
 
 print(fuzzer())
 print("\n")
@@ -53,34 +52,42 @@ print("First bc run stderr: ", result.stderr)
 trials = 100
 program = "bc"
 
-runs = []
+# The input file lives in memory and is rewritten in place for every trial
+bc = FileProgramRunner([program, "@@"], discard_stdout=True)
+
+# Keep counters and a bounded sample of the runs with errors only,
+# so memory does not grow with `trials`
+MAX_ERRORS = 10
+aggregator = OutcomeAggregator(keep=(), max_kept=0)
+no_stderr = 0
+errors = []
+strange_errors = []
 
 for i in range(trials):
     data = fuzzer()
-    with open(FILE, "w") as f:
-        f.write(data)
-    result = subprocess.run([program, FILE],
-                            stdin=subprocess.DEVNULL,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            universal_newlines=True)
-    runs.append((data, result))
+    result, outcome = bc.run(data)
+    aggregator.add(result, outcome)
+    if result.stderr == "":
+        no_stderr += 1
+        continue
+    if len(errors) < MAX_ERRORS:
+        errors.append((data, result))
+    if "illegal character" not in result.stderr \
+            and "parse error" not in result.stderr \
+            and "syntax error" not in result.stderr \
+            and len(strange_errors) < MAX_ERRORS:
+        strange_errors.append(result.stderr)
 
 print("number of result with empty stderr: ")
-print(sum(1 for (data, result) in runs if result.stderr == ""))
+print(no_stderr)
 
-errors = [(data, result) for (data, result) in runs if result.stderr != ""]
 (first_data, first_result) = errors[0]
 
-print("number of result with error: ", len(errors))
+print("number of result with error: ", aggregator.total() - no_stderr)
 print(repr(first_data))
 print(first_result.stderr)
 
-print("Print strange result from error Array:  ", [result.stderr for (data, result) in runs if
- result.stderr != ""
- and "illegal character" not in result.stderr
- and "parse error" not in result.stderr
- and "syntax error" not in result.stderr])
-
-print("Cause number of crashing with nonzero code are: ", sum(1 for (data, result) in runs if result.returncode != 0))
+print("Print strange result from error Array:  ", strange_errors)
 
+print("Cause number of crashing with nonzero code are: ",
+      aggregator.total() - aggregator.counts[Runner.PASS])
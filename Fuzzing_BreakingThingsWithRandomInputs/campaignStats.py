@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+from typing import Iterable, Iterator, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from runnerClass import Fuzzer, Runner, Outcome
+import json
+import os
+import subprocess
+import threading
+import time
+
+
+class CampaignStats:
+    """Live progress of a fuzzing campaign.
+
+       The hot loop only increments counters; every `check_every`
+       executions, the status file is rewritten if `interval` seconds
+       have passed. A `StatsServer` serves the same numbers over HTTP."""
+
+    def __init__(self, path: Optional[str] = None, interval: float = 1.0,
+                 check_every: int = 64) -> None:
+        """`path` is the status file (JSON), rewritten at most every
+           `interval` seconds; the clock is looked at every
+           `check_every` executions"""
+        self.path = path
+        self.interval = interval
+        self.check_every = check_every
+        self.execs = 0
+        self.crashes = 0
+        self.buckets: set[str] = set()
+        self.corpus_size = 0
+        self.start = self.last_finding = self.last_write = time.monotonic()
+        self.next_check = check_every
+        # Executions at the previous write, for the current rate
+        self.last_execs = 0
+        self.current_rate = 0.0
+
+    def execution(self, n: int = 1) -> None:
+        """Count `n` executions of the target"""
+        self.execs += n
+        if self.execs >= self.next_check:
+            self.next_check = self.execs + self.check_every
+            if time.monotonic() - self.last_write >= self.interval:
+                self.write()
+
+    def finding(self) -> None:
+        """Note a new finding, e.g. new coverage or a new crash bucket"""
+        self.last_finding = time.monotonic()
+
+    def crash(self, bucket: Optional[str] = None) -> bool:
+        """Count a crash in `bucket`. Return True if the bucket is new."""
+        self.crashes += 1
+        if bucket is None or bucket in self.buckets:
+            return False
+        self.buckets.add(bucket)
+        self.finding()
+        return True
+
+    def snapshot(self) -> dict:
+        """Return the current numbers"""
+        now = time.monotonic()
+        return {
+            "execs": self.execs,
+            "execs_per_sec": self.execs / max(now - self.start, 1e-9),
+            "current_execs_per_sec": self.current_rate,
+            "crashes": self.crashes,
+            "unique_buckets": len(self.buckets),
+            "corpus_size": self.corpus_size,
+            "seconds_since_last_finding": now - self.last_finding,
+            "elapsed": now - self.start,
+        }
+
+    def write(self) -> None:
+        """Update the current rate and rewrite the status file"""
+        now = time.monotonic()
+        if now > self.last_write:
+            self.current_rate = (self.execs - self.last_execs) / (now - self.last_write)
+        self.last_write = now
+        self.last_execs = self.execs
+        if self.path is not None:
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(self.path + ".tmp", self.path)
+
+    def track(self, runs: Iterable[tuple[subprocess.CompletedProcess, Outcome]],
+              fuzzer: Optional[Fuzzer] = None) \
+            -> Iterator[tuple[subprocess.CompletedProcess, Outcome]]:
+        """Pass `runs` (e.g. from `Fuzzer.iter_runs()`) through, counting
+           executions and failures. The corpus size is taken from
+           the `population` of `fuzzer` (e.g. `GreyboxFuzzer`), if any."""
+        population = getattr(fuzzer, "population", None)
+        for result, outcome in runs:
+            if population is not None and len(population) != self.corpus_size:
+                self.corpus_size = len(population)
+                self.finding()
+            if outcome == Runner.FAIL:
+                self.crash()
+            self.execution()
+            yield result, outcome
+        self.write()
+
+
+class StatsServer:
+    """Serve `CampaignStats.snapshot()` as JSON on a local port."""
+
+    def __init__(self, stats: CampaignStats, host: str = "127.0.0.1",
+                 port: int = 0) -> None:
+        """Start serving in a background thread;
+           `port` 0 picks a free port (see `url`)"""
+        class StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = json.dumps(stats.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), StatsHandler)
+        self.url = "http://%s:%d/" % self.httpd.server_address[:2]
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import urllib.request
+    from runnerClass import ProgramRunner, RandomFuzzer
+
+    status_file = os.path.join(tempfile.mkdtemp(prefix="stats"), "status.json")
+    stats = CampaignStats(status_file, interval=0.1)
+    server = StatsServer(stats)
+
+    random_fuzzer = RandomFuzzer()
+    for result, outcome in stats.track(
+            random_fuzzer.iter_runs(ProgramRunner("cat"), 200)):
+        pass
+
+    with open(status_file) as f:
+        assert json.load(f)["execs"] == 200
+    print(urllib.request.urlopen(server.url).read().decode())
+    server.close()
@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+
+from typing import Any, Iterator, Optional
+from collections import Counter
+from runnerClass import Fuzzer, Runner, Outcome
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+
+
+class CorpusStore:
+    """Inputs stored in a directory, one file each, named by content hash.
+
+       Storing an input twice costs nothing, and corpora of different
+       machines merge by copying only the files the other side lacks."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def add(self, data: bytes) -> str:
+        """Store `data`; return its digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def __contains__(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in os.listdir(self.directory)
+                if not name.endswith(".tmp"))
+
+    def __len__(self) -> int:
+        return sum(1 for digest in self)
+
+    def merge(self, other: "CorpusStore") -> int:
+        """Copy the inputs of `other` missing here; return their number"""
+        copied = 0
+        for digest in other:
+            if digest not in self:
+                shutil.copyfile(other.path(digest), self.path(digest) + ".tmp")
+                os.replace(self.path(digest) + ".tmp", self.path(digest))
+                copied += 1
+        return copied
+
+
+class Checkpoint:
+    """Campaign state saved to a directory at regular intervals.
+
+       The state is a small JSON file (counters, the next trial, corpus
+       digests and whatever the caller puts in `extra`, e.g. crash buckets
+       from `CrashBuckets.to_json()`); the inputs themselves live in a
+       `CorpusStore`."""
+
+    STATE_FILE = "state.json"
+
+    def __init__(self, directory: str, interval: float = 60.0) -> None:
+        """Save into `directory`, at most every `interval` seconds"""
+        self.directory = directory
+        self.interval = interval
+        self.corpus = CorpusStore(os.path.join(directory, "corpus"))
+        self.extra: dict[str, Any] = {}
+        self.last_save = time.monotonic()
+
+    def due(self) -> bool:
+        """Return True if the next checkpoint is due"""
+        return time.monotonic() - self.last_save >= self.interval
+
+    def save(self, state: dict[str, Any]) -> None:
+        """Atomically replace the saved state by `state` and `extra`"""
+        path = os.path.join(self.directory, self.STATE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(dict(state, extra=self.extra), f)
+        os.replace(path + ".tmp", path)
+        self.last_save = time.monotonic()
+
+    def load(self) -> Optional[dict[str, Any]]:
+        """Return the saved state (restoring `extra`), or None"""
+        path = os.path.join(self.directory, self.STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        self.extra = state.pop("extra", {})
+        return state
+
+
+def resumable_runs(fuzzer: Fuzzer, runner: Runner, checkpoint: Checkpoint,
+                   campaign_seed: int, shard: int = 0,
+                   trials: Optional[int] = None) \
+        -> Iterator[tuple[int, subprocess.CompletedProcess, Outcome]]:
+    """Like `Fuzzer.campaign_runs()`, but resuming from and saving to
+       `checkpoint`. The corpus of fuzzers with a `population`
+       (e.g. `GreyboxFuzzer`) is saved and restored as well.
+       Yield `(trial, result, outcome)`; `trials` counts from the start
+       of the campaign, not from the resume."""
+    state = checkpoint.load()
+    if state is not None:
+        assert (state["seed"], state["shard"]) == (campaign_seed, shard), \
+            "checkpoint belongs to another campaign"
+        first_trial = state["trial"]
+        counts = Counter(state["counts"])
+        if hasattr(fuzzer, "population"):
+            fuzzer.population = [checkpoint.corpus.get(digest).decode()
+                                 for digest in state["corpus"]]
+            fuzzer.seed_index = len(fuzzer.seeds)
+    else:
+        first_trial = 0
+        counts = Counter()
+
+    def current_state(next_trial: int) -> dict[str, Any]:
+        corpus = []
+        if hasattr(fuzzer, "population"):
+            corpus = [checkpoint.corpus.add(inp.encode())
+                      for inp in fuzzer.population]
+        return {"seed": campaign_seed, "shard": shard, "trial": next_trial,
+                "counts": counts, "corpus": corpus}
+
+    remaining = None if trials is None else max(0, trials - first_trial)
+    next_trial = first_trial
+    try:
+        for trial, result, outcome in fuzzer.campaign_runs(
+                runner, campaign_seed, shard, remaining, first_trial):
+            counts[outcome] += 1
+            next_trial = trial + 1
+            yield trial, result, outcome
+            # After the caller has accounted for the trial in `extra`
+            if checkpoint.due():
+                checkpoint.save(current_state(next_trial))
+    finally:
+        # Also when the caller stops early
+        checkpoint.save(current_state(next_trial))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from runnerClass import ProgramRunner, RandomFuzzer
+
+    directory = tempfile.mkdtemp(prefix="checkpoint")
+    cat = ProgramRunner(program="cat")
+    random_fuzzer = RandomFuzzer()
+
+    # Stop after 10 trials, then resume up to 25
+    first = [trial for trial, result, outcome in resumable_runs(
+        random_fuzzer, cat, Checkpoint(directory), 42, trials=10)]
+    second = [trial for trial, result, outcome in resumable_runs(
+        random_fuzzer, cat, Checkpoint(directory), 42, trials=25)]
+    assert first + second == list(range(25))
+    print(Checkpoint(directory).load())
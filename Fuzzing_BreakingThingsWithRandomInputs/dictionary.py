@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+from typing import Iterable, Optional
+from runnerClass import Fuzzer, RandomFuzzer
+import re
+import shutil
+import subprocess
+
+# Printable strings in a binary, as `strings(1)` finds them
+RE_STRING = re.compile(rb"[\x20-\x7e]{4,64}")
+
+# Immediate operands of comparisons in `objdump -d` output, e.g.
+#   cmp    $0xdeadbeef,%eax
+RE_CMP_IMMEDIATE = re.compile(r"\bcmp[bwlq]?\s+\$0x([0-9a-f]+),")
+
+# Entries of AFL-style dictionaries, e.g. `magic="\xef\xbe\xad\xde"`
+RE_DICT_ENTRY = re.compile(r'^\s*(?:[\w@.-]+\s*=\s*)?"(.*)"\s*$')
+
+
+class Dictionary:
+    """Tokens and magic numbers the target compares its input against."""
+
+    def __init__(self, strings: Iterable[bytes] = (),
+                 integers: Iterable[int] = ()) -> None:
+        self.strings = sorted(set(strings))
+        self.integers = sorted(set(integers))
+
+    def add_strings(self, strings: Iterable[bytes]) -> None:
+        self.strings = sorted(set(self.strings) | set(strings))
+
+    def add_integers(self, integers: Iterable[int]) -> None:
+        self.integers = sorted(set(self.integers) | set(integers))
+
+    def load(self, path: str) -> None:
+        """Add the entries of the AFL-style dictionary at `path`,
+           e.g. comparison operands logged by AFL++ `AFL_LLVM_DICT2FILE`"""
+        with open(path) as f:
+            for line in f:
+                match = RE_DICT_ENTRY.match(line)
+                if match:
+                    token = match.group(1).encode("latin-1")
+                    self.add_strings([token.decode("unicode_escape")
+                                      .encode("latin-1")])
+
+    def __len__(self) -> int:
+        return len(self.strings) + len(self.integers)
+
+
+def binary_strings(path: str) -> list[bytes]:
+    """Return the printable strings in the binary at `path`"""
+    with open(path, "rb") as f:
+        return RE_STRING.findall(f.read())
+
+
+def comparison_constants(path: str, min_value: int = 256) -> list[int]:
+    """Return the immediate operands of comparisons in the binary at `path`
+       that are at least `min_value` (small ones are found by chance).
+       Needs `objdump`; returns an empty list without it."""
+    if shutil.which("objdump") is None:
+        return []
+    disassembly = subprocess.run(["objdump", "-d", path],
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL,
+                                 universal_newlines=True).stdout
+    values = set()
+    for match in RE_CMP_IMMEDIATE.finditer(disassembly):
+        value = int(match.group(1), 16)
+        if value >= min_value:
+            values.add(value)
+    return sorted(values)
+
+
+def extract_dictionary(path: str, runtime_dictionary: Optional[str] = None) \
+        -> Dictionary:
+    """Build a dictionary from the binary at `path`, adding the entries
+       of `runtime_dictionary` (an AFL-style dictionary file) if given"""
+    dictionary = Dictionary(binary_strings(path), comparison_constants(path))
+    if runtime_dictionary is not None:
+        dictionary.load(runtime_dictionary)
+    return dictionary
+
+
+"""A RandomFuzzer splicing dictionary tokens into its inputs"""
+class DictionaryFuzzer(RandomFuzzer):
+    """Produce random inputs containing dictionary tokens."""
+
+    def __init__(self, dictionary: Dictionary, token_probability: float = 0.3,
+                 **kwargs) -> None:
+        """`token_probability` is the chance to insert a token (repeatedly);
+           other keyword arguments are passed to `RandomFuzzer`"""
+        super().__init__(**kwargs)
+        self.tokens = [token.decode("latin-1") for token in dictionary.strings]
+        self.tokens += [str(value) for value in dictionary.integers]
+        self.token_probability = token_probability
+
+    def fuzz(self) -> str:
+        inp = super().fuzz()
+        while self.tokens and self.rng.random() < self.token_probability:
+            pos = self.rng.randint(0, len(inp))
+            inp = inp[:pos] + self.rng.choice(self.tokens) + inp[pos:]
+        return inp
+
+
+"""Fuzz integer command-line arguments"""
+class ArgumentFuzzer(Fuzzer):
+    """Produce lists of integer arguments, using dictionary values."""
+
+    def __init__(self, integers: list[int], arguments: int = 4,
+                 constant_probability: float = 0.3,
+                 min_value: int = -2147483647,
+                 max_value: int = 2147483647) -> None:
+        """Produce `arguments` integers in [`min_value`, `max_value`];
+           each one is taken from `integers` with `constant_probability`"""
+        self.integers = integers
+        self.arguments = arguments
+        self.constant_probability = constant_probability
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def fuzz(self) -> list[str]:
+        args = []
+        for i in range(self.arguments):
+            if self.integers and self.rng.random() < self.constant_probability:
+                args.append(str(self.rng.choice(self.integers)))
+            else:
+                args.append(str(self.rng.randint(self.min_value,
+                                                 self.max_value)))
+        return args
+
+
+assert RE_CMP_IMMEDIATE.search("  cmp    $0xdeadbeef,%eax").group(1) == "deadbeef"
+assert RE_DICT_ENTRY.match('magic="\\xef\\xbe"').group(1) == "\\xef\\xbe"
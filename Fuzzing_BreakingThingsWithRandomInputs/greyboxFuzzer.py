@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+
+from typing import Optional, Union
+from runnerClass import Fuzzer, Runner, ProgramRunner, Outcome
+import atexit
+import ctypes
+import os
+import random
+import subprocess
+
+"""Coverage feedback from targets instrumented by AFL (afl-clang-fast etc.)"""
+class CoverageMap:
+    """An AFL-style edge coverage bitmap in System V shared memory.
+
+       Instrumented targets find the map through the `__AFL_SHM_ID`
+       environment variable (see `environment()`) and count every edge
+       they take in it. The segment is removed by `close()`, or at exit."""
+
+    MAP_SIZE = 1 << 16
+    SHM_ENV_VAR = "__AFL_SHM_ID"
+
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_EXCL = 0o2000
+    IPC_RMID = 0
+
+    # Hit counts are put into buckets (1, 2, 3, 4-7, 8-15, 16-31, 32-127,
+    # 128+), so that only a change of bucket counts as new behavior
+    BUCKETS = bytes([0, 1, 2, 4] + [8] * 4 + [16] * 8 + [32] * 16 +
+                    [64] * 96 + [128] * 128)
+
+    def __init__(self, size: int = MAP_SIZE) -> None:
+        """Create a map of `size` bytes"""
+        self.size = size
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.libc.shmat.restype = ctypes.c_void_p
+        self.libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        self.libc.shmdt.argtypes = [ctypes.c_void_p]
+
+        self.shm_id = self.libc.shmget(self.IPC_PRIVATE, size,
+                                       self.IPC_CREAT | self.IPC_EXCL | 0o600)
+        if self.shm_id < 0:
+            raise OSError(ctypes.get_errno(), "shmget() failed")
+        self.address = self.libc.shmat(self.shm_id, None, 0)
+        if self.address in (None, ctypes.c_void_p(-1).value):
+            self.libc.shmctl(self.shm_id, self.IPC_RMID, None)
+            raise OSError(ctypes.get_errno(), "shmat() failed")
+        atexit.register(self.close)
+
+        # Edges (and hit count buckets) seen so far, as one big integer
+        self.seen = 0
+
+    def environment(self, env: Optional[dict[str, str]] = None) \
+            -> dict[str, str]:
+        """Return `env` (default: this process's environment)
+           with the map exported to instrumented targets"""
+        return dict(os.environ if env is None else env,
+                    **{self.SHM_ENV_VAR: str(self.shm_id)})
+
+    def clear(self) -> None:
+        """Reset the map before a run"""
+        ctypes.memset(self.address, 0, self.size)
+
+    def trace(self) -> bytes:
+        """Return the bucketed hit counts of the last run"""
+        return ctypes.string_at(self.address, self.size).translate(self.BUCKETS)
+
+    def update(self, trace: bytes) -> bool:
+        """Add `trace` to the coverage seen so far.
+           Return True if it contains new edges or hit count buckets."""
+        bits = int.from_bytes(trace, "little")
+        if bits & ~self.seen == 0:
+            return False
+        self.seen |= bits
+        return True
+
+    def edges(self) -> int:
+        """Return the number of distinct edges seen so far"""
+        return sum(1 for byte in self.seen.to_bytes(self.size, "little")
+                   if byte)
+
+    def close(self) -> None:
+        """Release the shared memory"""
+        if self.address is not None:
+            self.libc.shmdt(self.address)
+            self.libc.shmctl(self.shm_id, self.IPC_RMID, None)
+            self.address = None
+            atexit.unregister(self.close)
+
+
+class CoverageRunner(Runner):
+    """Wrap a program runner, collecting edge coverage of every run."""
+
+    def __init__(self, runner: ProgramRunner,
+                 coverage_map: Optional[CoverageMap] = None) -> None:
+        """`runner` runs the instrumented target; its environment is
+           extended by the map. `coverage_map` is created if not given."""
+        self.runner = runner
+        self.coverage_map = coverage_map or CoverageMap()
+        runner.env = self.coverage_map.environment(runner.env)
+        self.new_coverage = False
+
+    def run(self, inp: Union[str, bytes]) \
+            -> tuple[subprocess.CompletedProcess, Outcome]:
+        """Run the wrapped runner with `inp`; set `new_coverage`
+           if the run reached new edges"""
+        self.coverage_map.clear()
+        result = self.runner.run(inp)
+        self.new_coverage = self.coverage_map.update(self.coverage_map.trace())
+        return result
+
+
+class Mutator:
+    """Simple mutations of strings: delete, insert or flip a character."""
+
+    # Source of randomness, as with `Fuzzer.rng`
+    rng = random
+
+    def delete_random_character(self, s: str) -> str:
+        if s == "":
+            return s
+        pos = self.rng.randint(0, len(s) - 1)
+        return s[:pos] + s[pos + 1:]
+
+    def insert_random_character(self, s: str) -> str:
+        pos = self.rng.randint(0, len(s))
+        return s[:pos] + chr(self.rng.randrange(32, 127)) + s[pos:]
+
+    def flip_random_character(self, s: str) -> str:
+        if s == "":
+            return s
+        pos = self.rng.randint(0, len(s) - 1)
+        bit = 1 << self.rng.randint(0, 6)
+        return s[:pos] + chr(ord(s[pos]) ^ bit) + s[pos + 1:]
+
+    def mutate(self, s: str) -> str:
+        mutator = self.rng.choice([self.delete_random_character,
+                                   self.insert_random_character,
+                                   self.flip_random_character])
+        return mutator(s)
+
+
+class GreyboxFuzzer(Fuzzer):
+    """Mutate inputs from a corpus, keeping those reaching new edges."""
+
+    def __init__(self, seeds: list[str], mutator: Optional[Mutator] = None,
+                 min_mutations: int = 1, max_mutations: int = 10) -> None:
+        """`seeds` form the initial corpus; every fuzz input applies
+           `min_mutations` to `max_mutations` mutations to one of them"""
+        self.seeds = seeds
+        self.mutator = mutator or Mutator()
+        self.min_mutations = min_mutations
+        self.max_mutations = max_mutations
+        self.reset()
+
+    def reset(self) -> None:
+        """Start over with the seeds only"""
+        self.population = list(self.seeds)
+        self.seed_index = 0
+        self.inp = ""
+        # Seeds are in the population already
+        self.replaying_seed = False
+
+    def fuzz(self) -> str:
+        """Return the next seed, then mutations of the corpus"""
+        self.replaying_seed = self.seed_index < len(self.seeds)
+        if self.replaying_seed:
+            self.inp = self.seeds[self.seed_index]
+            self.seed_index += 1
+        else:
+            self.mutator.rng = self.rng
+            inp = self.rng.choice(self.population)
+            for i in range(self.rng.randint(self.min_mutations,
+                                            self.max_mutations)):
+                inp = self.mutator.mutate(inp)
+            self.inp = inp
+        return self.inp
+
+    def run(self, runner: CoverageRunner) \
+            -> tuple[subprocess.CompletedProcess, Outcome]:
+        """Run `runner` with fuzz input; add the input to the corpus
+           if it reached new coverage"""
+        result = super().run(runner)
+        if runner.new_coverage and not self.replaying_seed:
+            self.population.append(self.inp)
+        return result
+
+
+if __name__ == "__main__":
+    coverage_runner = CoverageRunner(ProgramRunner(["cat"]))
+    greybox_fuzzer = GreyboxFuzzer(["hello"])
+    greybox_fuzzer.runs(coverage_runner, trials=100)
+    # `cat` is not instrumented, so the corpus stays at the seeds
+    print(len(greybox_fuzzer.population), coverage_runner.coverage_map.edges())
+    coverage_runner.coverage_map.close()
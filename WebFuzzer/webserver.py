@@ -310,5 +310,6 @@ def start_httpd(handler_class: type = SimpleHTTPRequestHandler) \
     httpd_url = HTTPD_MESSAGE_QUEUE.get()
     return httpd_process, httpd_url
 
-httpd_process, httpd_url = start_httpd()
-print(httpd_url)
+if __name__ == "__main__":
+    httpd_process, httpd_url = start_httpd()
+    print(httpd_url)
@@ -3,10 +3,17 @@ import string
 import copy
 from hashlib import new
 from fuzzingbook.MutationFuzzer import MutationFuzzer
-from typing import Set
+from typing import Any, Callable, Optional, Set, Union
+from functools import lru_cache
 from itertools import zip_longest
+import hashlib
+import importlib.util
+import json
+import math
+import os
 import re
 import random
+import tempfile
 
 DIGIT_GRAMMAR = {
     "<start>":
@@ -69,7 +76,229 @@ assert not is_nonterminal("+")
 class ExpansionError(Exception):
     pass
 
-def simple_grammar_fuzzer(grammar: Grammar, 
+# A derivation tree is a pair (symbol, children). `children` is None
+# for a nonterminal not expanded yet, and [] for a terminal string.
+DerivationTree = tuple[str, Optional[list]]
+
+@lru_cache(maxsize=None)
+def expansion_pieces(expansion: str) -> tuple[tuple[tuple[str, bool], ...],
+                                              tuple[int, ...]]:
+    """Split `expansion` into `(piece, is_nonterminal)` pairs.
+       Also return the positions of the nonterminals among the pieces."""
+    pieces = tuple((piece, bool(is_nonterminal(piece)))
+                   for piece in RE_NONTERMINAL.split(expansion) if piece)
+    if not pieces:
+        # The empty expansion still yields a (terminal) child
+        pieces = (("", False),)
+    positions = tuple(i for i, (piece, nonterminal) in enumerate(pieces)
+                      if nonterminal)
+    return pieces, positions
+
+"""Weighted choice of expansions"""
+class AliasTable:
+    """Draw index `i` with probability proportional to `weights[i]`
+       in constant time, with Walker's alias method (in Vose's variant):
+       pick a slot uniformly, then either its own index or its alias."""
+
+    def __init__(self, weights: list[float]) -> None:
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            # The excess of `more` fills up the slot of `less`
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+    def sample(self) -> int:
+        """Return a random index"""
+        u = random.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+def expansion_probabilities(options: list[dict]) -> list[float]:
+    """Return the probability of each expansion: its `prob` option, or
+       an equal share of the probability the others leave"""
+    specified = [opts.get("prob") for opts in options]
+    rest = 1 - sum(p for p in specified if p is not None)
+    unspecified = specified.count(None)
+    assert rest >= -1e-9 and (unspecified > 0 or rest <= 1e-9), \
+        "probabilities must add up to 1"
+    share = max(rest, 0) / unspecified if unspecified else 0.0
+    return [share if p is None else p for p in specified]
+
+assert expansion_probabilities([{"prob": 0.5}, {}, {}]) == [0.5, 0.25, 0.25]
+
+def alias_table(weights: list[float]) -> Optional[AliasTable]:
+    """Return an `AliasTable` for `weights`, or None if they are all equal
+       (uniform choice is cheaper) or all zero"""
+    if len(set(weights)) <= 1 or sum(weights) <= 0:
+        return None
+    return AliasTable(weights)
+
+class CompiledGrammar:
+    """A grammar prepared once for generation and analysis.
+
+       Symbols are numbered: `symbols[s]` is the name of symbol `s` and
+       `ids` maps names back to numbers. For every symbol `s`:
+       `expansions[s]` lists its expansions, each a tuple of terminal
+         strings and symbol numbers,
+       `nonterminals[s]` lists, per expansion, the `(position, symbol)`
+         pairs of its nonterminals,
+       `options[s]` lists, per expansion, its options (e.g. `prob`),
+         `{}` if it has none,
+       `probabilities[s]` lists the probability of each expansion,
+       `alias[s]` is an `AliasTable` to choose an expansion by these
+         probabilities, or None if all are equally likely,
+       `texts[s]` lists the expansion strings, for logging."""
+
+    def __init__(self, grammar: Grammar) -> None:
+        self.symbols = list(grammar)
+        self.ids = {symbol: s for s, symbol in enumerate(self.symbols)}
+        self.expansions: list[list[tuple]] = []
+        self.nonterminals: list[list[tuple[tuple[int, int], ...]]] = []
+        self.options: list[list[dict]] = []
+        self.texts: list[list[str]] = []
+
+        for symbol in self.symbols:
+            expansions, nonterminals_, options, texts = [], [], [], []
+            for expansion in grammar[symbol]:
+                # In later chapters, we allow expansions to be tuples,
+                # with the expansion being the first element
+                opts = {}
+                if isinstance(expansion, tuple):
+                    if len(expansion) > 1:
+                        opts = expansion[1]
+                    expansion = expansion[0]
+                pieces, positions = expansion_pieces(expansion)
+                expansions.append(tuple(self.ids[piece] if nonterminal
+                                        else piece
+                                        for piece, nonterminal in pieces))
+                nonterminals_.append(tuple((position, self.ids[pieces[position][0]])
+                                           for position in positions))
+                options.append(opts)
+                texts.append(expansion)
+            self.expansions.append(expansions)
+            self.nonterminals.append(nonterminals_)
+            self.options.append(options)
+            self.texts.append(texts)
+
+        self.probabilities = [expansion_probabilities(options)
+                              for options in self.options]
+        self.alias = [alias_table(probabilities)
+                      for probabilities in self.probabilities]
+        # The `CostTable`, once computed by `cost_table()`
+        self.costs: Optional["CostTable"] = None
+
+    def choose(self, symbol: int) -> int:
+        """Return the index of a random expansion of `symbol`"""
+        table = self.alias[symbol]
+        if table is None:
+            return random.randrange(len(self.expansions[symbol]))
+        return table.sample()
+
+    def children(self, symbol: int, expansion: int) -> list[DerivationTree]:
+        """Return new child nodes for `expansion` of `symbol`"""
+        return [(item, []) if isinstance(item, str)
+                else (self.symbols[item], None)
+                for item in self.expansions[symbol][expansion]]
+
+# Grammars compiled in this process, by content (see `compile_grammar()`)
+_compiled_grammars: dict[str, CompiledGrammar] = {}
+MAX_COMPILED_GRAMMARS = 64
+
+def compile_grammar(grammar: Union[Grammar, CompiledGrammar]) -> CompiledGrammar:
+    """Return `grammar` compiled, unless it already is.
+       Compiled grammars are cached by content, so that a grammar is
+       compiled once, but changes to it take effect."""
+    if isinstance(grammar, CompiledGrammar):
+        return grammar
+    key = json.dumps(grammar, default=repr)
+    compiled = _compiled_grammars.pop(key, None)
+    if compiled is None:
+        compiled = CompiledGrammar(grammar)
+        if len(_compiled_grammars) >= MAX_COMPILED_GRAMMARS:
+            # Evict the least recently used
+            del _compiled_grammars[next(iter(_compiled_grammars))]
+    # (Re-)insert as the most recently used
+    _compiled_grammars[key] = compiled
+    return compiled
+
+compiled_expr = compile_grammar(EXPR_GRAMMAR)
+assert compiled_expr.expansions[compiled_expr.ids["<expr>"]][0] == \
+    (compiled_expr.ids["<term>"], " + ", compiled_expr.ids["<expr>"])
+assert compiled_expr.nonterminals[compiled_expr.ids["<factor>"]][2] == \
+    ((1, compiled_expr.ids["<expr>"]),)
+
+def tree_to_string(tree: DerivationTree) -> str:
+    """Return the string `tree` stands for.
+       Nonterminals not expanded yet show as themselves."""
+    parts = []
+    stack = [tree]
+    while stack:
+        symbol, children = stack.pop()
+        if children:
+            stack.extend(reversed(children))
+        else:
+            parts.append(symbol)
+    return "".join(parts)
+
+assert tree_to_string(("<start>", [("<a>", None), ("+", []), ("<b>", [("", [])])])) == "<a>+"
+
+def derivation_tree_fuzzer(grammar: Union[Grammar, CompiledGrammar],
+                           start_symbol: str = START_SYMBOL,
+                           max_nonterminals: int = 10,
+                           max_expansion_trials: int = 100,
+                           log: bool = False) -> DerivationTree:
+    """Produce a derivation tree from `grammar`.
+       Arguments are as with `simple_grammar_fuzzer()`, which produces
+       strings with the same distribution. Unexpanded nonterminals are
+       kept in a list (the frontier), so an expansion costs the same
+       no matter how large the tree has grown.
+       `grammar` is compiled on its first use only."""
+    grammar = compile_grammar(grammar)
+
+    # The root is kept in a list, so that it can be replaced like any child
+    root: list[DerivationTree] = [(start_symbol, None)]
+    # Nonterminals to expand, as (list holding the node, index in that list,
+    # symbol number)
+    frontier = [(root, 0, grammar.ids[start_symbol])]
+    expansion_trials = 0
+
+    while frontier:
+        i = random.randrange(len(frontier))
+        siblings, index, symbol = frontier[i]
+        expansion = grammar.choose(symbol)
+        new_nonterminals = grammar.nonterminals[symbol][expansion]
+
+        if len(frontier) - 1 + len(new_nonterminals) < max_nonterminals:
+            children = grammar.children(symbol, expansion)
+            siblings[index] = (siblings[index][0], children)
+            # Remove the expanded node in O(1): move the last one into its place
+            frontier[i] = frontier[-1]
+            frontier.pop()
+            frontier.extend((children, position, child)
+                            for position, child in new_nonterminals)
+            if log:
+                print("%-40s" % (grammar.symbols[symbol] + " -> " +
+                                 grammar.texts[symbol][expansion]),
+                      tree_to_string(root[0]))
+            expansion_trials = 0
+        else:
+            expansion_trials += 1
+            if expansion_trials >= max_expansion_trials:
+                raise ExpansionError("Cannot expand " +
+                                     repr(tree_to_string(root[0])))
+
+    return root[0]
+
+def simple_grammar_fuzzer(grammar: Union[Grammar, CompiledGrammar],
                           start_symbol: str = START_SYMBOL,
                           max_nonterminals: int = 10,
                           max_expansion_trials: int = 100,
@@ -79,38 +308,286 @@ def simple_grammar_fuzzer(grammar: Grammar,
        `max_nonterminals`: the maximum number of nonterminals 
          still left for expansion
        `max_expansion_trials`: maximum # of attempts to produce a string
-       `log`: print expansion progress if True"""
-
-    term = start_symbol
-    expansion_trials = 0
-
-    while len(nonterminals(term)) > 0:
-        symbol_to_expand = random.choice(nonterminals(term))
-        expansions = grammar[symbol_to_expand]
-        expansion = random.choice(expansions)
-        # In later chapters, we allow expansions to be tuples,
-        # with the expansion being the first element
-        if isinstance(expansion, tuple):
-            expansion = expansion[0]
-
-        new_term = term.replace(symbol_to_expand, expansion, 1)
-
-        if len(nonterminals(new_term)) < max_nonterminals:
-            term = new_term
-            if log:
-                print("%-40s" % (symbol_to_expand + " -> " + expansion), term)
-            expansion_trials = 0
-        else:
-            expansion_trials += 1
-            if expansion_trials >= max_expansion_trials:
-                raise ExpansionError("Cannot expand " + repr(term))
-
-    return term
+       `log`: print expansion progress if True
+       See `derivation_tree_fuzzer()` to obtain the derivation tree."""
+    return tree_to_string(derivation_tree_fuzzer(
+        grammar, start_symbol, max_nonterminals, max_expansion_trials, log))
 
 
 for i in range(5):
     print(simple_grammar_fuzzer(grammar=EXPR_GRAMMAR, max_nonterminals=3))
 
+print(derivation_tree_fuzzer(DIGIT_GRAMMAR))
+
+class CostTable:
+    """Minimum cost and depth of the symbols and expansions of a grammar.
+
+       The cost of a symbol is the least number of expansions turning it
+       into a terminal string; its depth is the least height of such a
+       derivation tree. Both are infinite for symbols that can never be
+       fully expanded. Compute the table once per grammar and reuse it.
+       All lists are indexed by the symbol numbers of `grammar`,
+       a `CompiledGrammar`."""
+
+    def __init__(self, grammar: Union[Grammar, CompiledGrammar]) -> None:
+        self.grammar = grammar = compile_grammar(grammar)
+        n = len(grammar.symbols)
+
+        # Iterate until no cost gets lower; this converges for recursive
+        # grammars, too, as costs only decrease
+        self.symbol_cost = [math.inf] * n
+        self.symbol_depth = [math.inf] * n
+        changed = True
+        while changed:
+            changed = False
+            for symbol in range(n):
+                for nonterminals_ in grammar.nonterminals[symbol]:
+                    cost = self.cost(nonterminals_)
+                    depth = self.depth(nonterminals_)
+                    if cost < self.symbol_cost[symbol]:
+                        self.symbol_cost[symbol] = cost
+                        changed = True
+                    if depth < self.symbol_depth[symbol]:
+                        self.symbol_depth[symbol] = depth
+                        changed = True
+
+        self.expansion_cost = [[self.cost(nonterminals_) for nonterminals_
+                                in grammar.nonterminals[symbol]]
+                               for symbol in range(n)]
+        self.expansion_depth = [[self.depth(nonterminals_) for nonterminals_
+                                 in grammar.nonterminals[symbol]]
+                                for symbol in range(n)]
+
+        # Indexes of the expansions that can be fully expanded at all,
+        # of those finishing fastest, and of those adding the most nonterminals
+        self.finite = []
+        self.cheapest = []
+        self.widest = []
+        for symbol, costs in enumerate(self.expansion_cost):
+            self.finite.append([i for i, cost in enumerate(costs)
+                                if cost < math.inf])
+            self.cheapest.append([i for i, cost in enumerate(costs)
+                                  if cost == self.symbol_cost[symbol]])
+            widths = {i: len(grammar.nonterminals[symbol][i])
+                      for i in self.finite[symbol]}
+            self.widest.append([i for i, width in widths.items()
+                                if width == max(widths.values())])
+
+        # Alias tables to choose among the finite expansions by probability
+        self.finite_alias = [
+            alias_table([grammar.probabilities[symbol][i] for i in finite])
+            if grammar.alias[symbol] is not None else None
+            for symbol, finite in enumerate(self.finite)]
+
+    def cost(self, nonterminals_: tuple[tuple[int, int], ...]) -> float:
+        """Return the minimum cost of an expansion with `nonterminals_`"""
+        return 1 + sum(self.symbol_cost[symbol] for position, symbol in nonterminals_)
+
+    def depth(self, nonterminals_: tuple[tuple[int, int], ...]) -> float:
+        """Return the minimum depth of an expansion with `nonterminals_`"""
+        return 1 + max((self.symbol_depth[symbol]
+                        for position, symbol in nonterminals_), default=0)
+
+def cost_table(grammar: Union[Grammar, CompiledGrammar]) -> CostTable:
+    """Return the `CostTable` of `grammar`, computed once per compiled grammar"""
+    grammar = compile_grammar(grammar)
+    if grammar.costs is None:
+        grammar.costs = CostTable(grammar)
+    return grammar.costs
+
+expr_costs = CostTable(EXPR_GRAMMAR)
+expr_ids = expr_costs.grammar.ids
+assert expr_costs.symbol_cost[expr_ids["<digit>"]] == 1
+assert expr_costs.symbol_cost[expr_ids["<start>"]] == 6
+assert expr_costs.symbol_depth[expr_ids["<start>"]] == 6
+assert expr_costs.cheapest[expr_ids["<factor>"]] == [4]
+
+def three_phase_tree_fuzzer(grammar: Union[Grammar, CompiledGrammar],
+                            start_symbol: str = START_SYMBOL,
+                            min_nonterminals: int = 0,
+                            max_nonterminals: int = 10,
+                            costs: Optional[CostTable] = None,
+                            log: bool = False) -> DerivationTree:
+    """Produce a derivation tree from `grammar` in three phases:
+       1. grow, with the expansions adding the most nonterminals, until
+          `min_nonterminals` nonterminals are left to expand;
+       2. expand at random until `max_nonterminals` are left;
+       3. close the tree with the cheapest expansions.
+       Only expansions that can be fully expanded are chosen and none is
+       rejected, so there is nothing to retry; `ExpansionError` is raised
+       only if `start_symbol` cannot be fully expanded at all.
+       `costs` is the `CostTable` of `grammar` (default: `cost_table()`)."""
+    if costs is None:
+        costs = cost_table(grammar)
+    grammar = costs.grammar
+    start = grammar.ids[start_symbol]
+    if costs.symbol_cost[start] == math.inf:
+        raise ExpansionError("Cannot expand " + start_symbol)
+
+    root: list[DerivationTree] = [(start_symbol, None)]
+    frontier = [(root, 0, start)]
+
+    def expand(i: int, choices: list[list[int]],
+               tables: Optional[list[Optional[AliasTable]]] = None) -> None:
+        """Expand the `i`-th node of the frontier with one of its `choices`
+           (indexes of expansions, per symbol), weighted by `tables`
+           if given"""
+        siblings, index, symbol = frontier[i]
+        table = tables[symbol] if tables is not None else None
+        if table is None:
+            expansion = random.choice(choices[symbol])
+        else:
+            expansion = choices[symbol][table.sample()]
+        children = grammar.children(symbol, expansion)
+        siblings[index] = (siblings[index][0], children)
+        frontier[i] = frontier[-1]
+        frontier.pop()
+        frontier.extend((children, position, child) for position, child
+                        in grammar.nonterminals[symbol][expansion])
+        if log:
+            print("%-40s" % (grammar.symbols[symbol] + " -> " +
+                             grammar.texts[symbol][expansion]),
+                  tree_to_string(root[0]))
+
+    # Stop growing after as many steps in a row without growth
+    # (e.g. in cycles of rules with a single nonterminal)
+    stalled = 0
+    while frontier and len(frontier) < min_nonterminals \
+            and stalled < min_nonterminals:
+        size = len(frontier)
+        expand(random.randrange(size), costs.widest)
+        stalled = stalled + 1 if len(frontier) <= size else 0
+
+    while frontier and len(frontier) < max_nonterminals:
+        expand(random.randrange(len(frontier)), costs.finite, costs.finite_alias)
+
+    while frontier:
+        expand(random.randrange(len(frontier)), costs.cheapest)
+
+    return root[0]
+
+print([tree_to_string(three_phase_tree_fuzzer(EXPR_GRAMMAR, min_nonterminals=5,
+                                              costs=expr_costs))
+       for i in range(5)])
+
+"""Generating Python code from grammars"""
+
+# Bump when the generated code changes, so that cached modules are rebuilt
+CODEGEN_VERSION = 2
+GRAMMAR_CACHE_DIR = os.environ.get(
+    "GRAMMAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "grammars"))
+
+def grammar_to_python(grammar: Union[Grammar, CompiledGrammar],
+                      start_symbol: str = START_SYMBOL,
+                      max_depth: int = 10) -> str:
+    """Return the source of a Python module producing strings from
+       `grammar`, with one function per nonterminal. Its `generate()`
+       returns a string derived from `start_symbol`: up to `max_depth`,
+       expansions are chosen at random (by their `prob` options, through
+       alias tables), below only the cheapest ones."""
+    costs = cost_table(grammar)
+    grammar = costs.grammar
+    start = grammar.ids[start_symbol]
+    if costs.symbol_cost[start] == math.inf:
+        raise ExpansionError("Cannot expand " + start_symbol)
+
+    def code(symbol: int, expansion: int, depth: str) -> str:
+        parts = [repr(item) if isinstance(item, str)
+                 else "_s%d(%s)" % (item, depth)
+                 for item in grammar.expansions[symbol][expansion]]
+        return " + ".join(parts)
+
+    def pick(table: str, symbol: int) -> str:
+        """Return code choosing from `table` by the probabilities of `symbol`"""
+        alias = costs.finite_alias[symbol]
+        if alias is None:
+            return "_choice(%s)" % table
+        tables.append("_P%d = %r" % (symbol, tuple(alias.prob)))
+        tables.append("_A%d = %r" % (symbol, tuple(alias.alias)))
+        return "_pick(%s, _P%d, _A%d)" % (table, symbol, symbol)
+
+    lines = ["# Generated from a grammar; do not edit",
+             "from random import choice as _choice, random as _random",
+             "",
+             "MAX_DEPTH = %d" % max_depth,
+             "",
+             "def _pick(table, prob, alias):",
+             "    u = _random() * len(table)",
+             "    i = int(u)",
+             "    return table[i] if u - i < prob[i] else table[alias[i]]"]
+    tables = []
+    for symbol, name in enumerate(grammar.symbols):
+        finite = costs.finite[symbol]
+        if not finite:
+            continue
+        lines += ["", "def _s%d(d):  # %s" % (symbol, name)]
+        if all(not grammar.nonterminals[symbol][i] for i in finite):
+            # Terminals only: pick one of the strings
+            tables.append("_T%d = (%s,)" % (symbol, ", ".join(
+                repr("".join(grammar.expansions[symbol][i])) for i in finite)))
+            lines.append("    return " + pick("_T%d" % symbol, symbol))
+        elif len(finite) == 1:
+            lines.append("    return " + code(symbol, finite[0], "d + 1"))
+        else:
+            # One function per expansion, picked from a table;
+            # beyond `MAX_DEPTH`, from the table of the cheapest ones
+            tables.append("_E%d = (%s,)" % (symbol, ", ".join(
+                "_e%d_%d" % (symbol, i) for i in finite)))
+            if costs.cheapest[symbol] == finite:
+                lines.append("    return %s(d + 1)" % pick("_E%d" % symbol, symbol))
+            else:
+                tables.append("_C%d = (%s,)" % (symbol, ", ".join(
+                    "_e%d_%d" % (symbol, i) for i in costs.cheapest[symbol])))
+                lines += ["    if d < MAX_DEPTH:",
+                          "        return %s(d + 1)" % pick("_E%d" % symbol, symbol),
+                          "    return _choice(_C%d)(d + 1)" % symbol]
+            for i in finite:
+                lines += ["def _e%d_%d(d):" % (symbol, i),
+                          "    return " + code(symbol, i, "d")]
+
+    lines += [""] + tables + ["",
+              "def generate():",
+              "    return _s%d(0)" % start, ""]
+    return "\n".join(lines)
+
+def grammar_hash(grammar: Grammar, start_symbol: str = START_SYMBOL,
+                 max_depth: int = 10) -> str:
+    """Return a hash identifying the code generated for `grammar`"""
+    key = json.dumps([CODEGEN_VERSION, grammar, start_symbol, max_depth],
+                     sort_keys=True, default=repr)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+# Generator modules loaded in this process, by grammar hash
+_grammar_modules: dict[str, Any] = {}
+
+def grammar_generator(grammar: Grammar, start_symbol: str = START_SYMBOL,
+                      max_depth: int = 10,
+                      cache_dir: Optional[str] = None) -> Callable[[], str]:
+    """Return a function producing strings from `grammar`, as generated
+       by `grammar_to_python()`. Generated modules are cached in
+       `cache_dir` (default: `GRAMMAR_CACHE_DIR`) by grammar hash,
+       so that later runs import them instead of generating them again."""
+    digest = grammar_hash(grammar, start_symbol, max_depth)
+    if digest not in _grammar_modules:
+        cache_dir = cache_dir or GRAMMAR_CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, "grammar_%s.py" % digest[:32])
+        if not os.path.exists(path):
+            # Other processes may be generating the same module
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(grammar_to_python(grammar, start_symbol, max_depth))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        spec = importlib.util.spec_from_file_location("grammar_" + digest[:32], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _grammar_modules[digest] = module
+    return _grammar_modules[digest].generate
+
 CGI_GRAMMAR: Grammar = {
     "<start>":
         ["<string>"],
@@ -172,6 +649,9 @@ URL_GRAMMAR: Grammar = {
 for i in range(10):
     print(simple_grammar_fuzzer(grammar=URL_GRAMMAR, max_nonterminals=10))
 
+generate_url = grammar_generator(URL_GRAMMAR)
+print([generate_url() for i in range(3)])
+
 TITLE_GRAMMAR: Grammar = {
     "<start>": ["<title>"],
     "<title>": ["<topic>: <subtopic>"],
@@ -190,10 +670,103 @@ TITLE_GRAMMAR: Grammar = {
     "<software-property>": ["Robustness", "Reliability", "Security"],
 }
 
-titles: Set[str] = set()
-while len(titles) < 10:
-    titles.add(simple_grammar_fuzzer(
-        grammar=TITLE_GRAMMAR, max_nonterminals=10))
+"""Suppressing duplicate outputs"""
+class BloomFilter:
+    """A set of strings in a fixed amount of memory.
+
+       Membership tests may wrongly say yes (with probability about
+       `error_rate` once `capacity` strings are in), but never wrongly
+       say no. 100 million strings at 0.1% take about 180 MB."""
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: str) -> list[int]:
+        """Return the bit positions of `item`; two hashes combined
+           give as many as needed"""
+        digest = hashlib.blake2b(item.encode("utf-8", "surrogatepass"),
+                                 digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add `item`. Return True if it was (certainly) not in before."""
+        new = False
+        bits = self.bits
+        for position in self.positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(item))
+
+bloom = BloomFilter(1000)
+assert bloom.add("abc") and not bloom.add("abc") and "abc" in bloom
+
+class GrammarExhausted(Exception):
+    pass
+
+class UniqueFuzzer:
+    """Produce outputs of a generator, dropping those produced before.
+
+       Seen outputs are kept in a `BloomFilter`, so memory stays bounded;
+       a few new outputs may be dropped as false positives, but no
+       output is ever returned twice."""
+
+    def __init__(self, generate: Callable[[], str], capacity: int = 1000000,
+                 error_rate: float = 0.001, max_attempts: int = 1000,
+                 window: int = 1000) -> None:
+        """`generate` produces outputs, e.g. `grammar_generator(...)`;
+           `capacity` and `error_rate` size the Bloom filter;
+           `max_attempts` duplicates in a row mean the grammar is exhausted;
+           `window` is the number of attempts `recent_rate` is taken over"""
+        self.generate = generate
+        self.seen = BloomFilter(capacity, error_rate)
+        self.max_attempts = max_attempts
+        self.window = window
+        self.attempts = 0
+        self.unique = 0
+        self.window_attempts = 0
+        self.window_unique = 0
+        self.recent_rate = 1.0
+
+    def fuzz(self) -> str:
+        """Return an output not returned before.
+           Raise `GrammarExhausted` after `max_attempts` duplicates in a row."""
+        for i in range(self.max_attempts):
+            output = self.generate()
+            new = self.seen.add(output)
+            self.attempts += 1
+            self.unique += new
+            self.window_attempts += 1
+            self.window_unique += new
+            if self.window_attempts == self.window:
+                self.recent_rate = self.window_unique / self.window
+                self.window_attempts = self.window_unique = 0
+            if new:
+                return output
+        raise GrammarExhausted("%d duplicates in a row" % self.max_attempts)
+
+    def uniqueness_rate(self) -> float:
+        """Return the fraction of generated outputs that were new"""
+        return self.unique / self.attempts if self.attempts else 1.0
+
+unique_titles = UniqueFuzzer(lambda: simple_grammar_fuzzer(
+    grammar=TITLE_GRAMMAR, max_nonterminals=10))
+titles: Set[str] = {unique_titles.fuzz() for i in range(10)}
+print("Uniqueness rate:", unique_titles.uniqueness_rate())
 
 #print(titles)
 
@@ -243,6 +816,15 @@ nonterminal_grammar = extend_grammar(nonterminal_grammar, {
 })
 
 print([simple_grammar_fuzzer(nonterminal_grammar, "<identifier>") for i in range(10)])
+
+# Digits, `-` and `_` get 1% each, letters share the rest
+probabilistic_nonterminal_grammar = extend_grammar(nonterminal_grammar, {
+    "<idchar>": (
+        srange(string.ascii_letters) +
+        [(c, {"prob": 0.01}) for c in srange(string.digits + "-_")])
+})
+compiled_identifiers = compile_grammar(probabilistic_nonterminal_grammar)
+print([simple_grammar_fuzzer(compiled_identifiers, "<identifier>") for i in range(10)])
 print("")
 
 def crange(character_start: str, character_end: str) -> list[str]: